@@ -0,0 +1,87 @@
+"""
+Microbenchmark of the authentication lookup on a user cache miss.
+
+Compares loading the full ``User`` entity with ``select(User)`` (identity
+map, attribute instrumentation, the password hash) against the Core query
+on the principal columns that ``get_current_user`` now runs. Both go
+through an AsyncSession on in-memory SQLite, so the driver cost is the same
+and the difference is the SQLAlchemy work per request. Memory is
+measured with tracemalloc in a separate pass, as the peak above the
+baseline while one lookup runs.
+
+Usage (from the app directory):
+    python benchmarks/bench_principal.py [iterations]
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import Base, Principal, User
+from utils import PRINCIPAL_QUERY
+
+
+async def orm_lookup(session: AsyncSession, user_id: int):
+    result = await session.execute(select(User).where(User.id == user_id))
+    user = result.scalars().first()
+    # A fresh session per request, as in get_db
+    session.expunge_all()
+    return user
+
+
+async def principal_lookup(session: AsyncSession, user_id: int):
+    row = (await session.execute(PRINCIPAL_QUERY, {"user_id": user_id})).first()
+    return Principal(*row)
+
+
+async def measure(session: AsyncSession, lookup, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await lookup(session, 1)
+    elapsed = (time.perf_counter() - start) / iterations * 1e6
+
+    # Peak memory above the baseline while one lookup runs
+    tracemalloc.start()
+    peak_total = 0
+    for _ in range(iterations // 10):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await lookup(session, 1)
+        peak_total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return elapsed, peak_total / (iterations // 10)
+
+
+async def main(iterations: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[User.__table__])
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        session.add(User(id=1, email="bench@example.com", hashed_password="x"))
+        await session.commit()
+
+        # Warm up compiled statement caches
+        await measure(session, orm_lookup, 200)
+        await measure(session, principal_lookup, 200)
+
+        orm = await measure(session, orm_lookup, iterations)
+        principal = await measure(session, principal_lookup, iterations)
+    await engine.dispose()
+
+    print(f"iterations:        {iterations}")
+    print(f"select(User):      {orm[0]:8.1f} us/lookup  {orm[1] / 1024:6.1f} KiB peak/lookup")
+    print(f"principal query:   {principal[0]:8.1f} us/lookup  {principal[1] / 1024:6.1f} KiB peak/lookup")
+    print(f"speedup:           {orm[0] / principal[0]:8.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from metrics import registry
+
+# Hot-file cache configuration
+MATERIALS_CACHE_DIR = os.getenv("MATERIALS_CACHE_DIR", "/tmp/materials-cache")
+# On Cloud Run /tmp is memory-backed and counts against the instance's 512Mi,
+# so the default stays a small fraction of it; raise it with the memory limit
+# or point MATERIALS_CACHE_DIR at a mounted volume
+MATERIALS_CACHE_MAX_BYTES = int(os.getenv("MATERIALS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+MATERIALS_CACHE_MAX_FILE_BYTES = int(os.getenv("MATERIALS_CACHE_MAX_FILE_BYTES", str(16 * 1024 * 1024)))
+
+# Metrics
+blob_cache_lookups = registry.counter(
+    "blob_cache_lookups_total",
+    "Hot-file cache lookups by result (hit, miss)"
+)
+blob_cache_evictions = registry.counter(
+    "blob_cache_evictions_total",
+    "Files evicted from the hot-file cache"
+)
+
+
+class BlobCache:
+    """
+    Size-bounded LRU cache of whole blobs on local disk.
+
+    Files are keyed by blob name and generation, so a replaced blob is never
+    served from a stale copy. Entries are written to a temporary file and
+    renamed into place once complete; eviction unlinks the least recently
+    used files until the cache fits in ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: str = MATERIALS_CACHE_DIR,
+        max_bytes: int = MATERIALS_CACHE_MAX_BYTES,
+        max_file_bytes: int = MATERIALS_CACHE_MAX_FILE_BYTES
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._filling = set()
+        self._lock = threading.Lock()
+
+        registry.gauge("blob_cache_bytes", "Bytes held in the hot-file cache", lambda: self._size)
+
+    def load(self) -> None:
+        """Adopt files left by a previous run, oldest access first."""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                os.unlink(entry.path)
+            elif entry.is_file():
+                stat = entry.stat()
+                found.append((stat.st_atime, entry.name, stat.st_size))
+        with self._lock:
+            for _, key, size in sorted(found):
+                self._files[key] = size
+                self._size += size
+        self._evict()
+
+    def cacheable(self, size: Optional[int]) -> bool:
+        return size is not None and size <= self.max_file_bytes
+
+    def open(self, name: str, generation: Optional[int]):
+        """
+        Open the cached copy for reading, marking it recently used.
+
+        The file is opened while the entry is still in the cache, so a later
+        eviction cannot take it away from the reader.
+
+        Returns:
+            A binary file object, or None if the blob is not cached
+        """
+        key = self._key(name, generation)
+        with self._lock:
+            if key in self._files:
+                try:
+                    f = open(os.path.join(self.directory, key), "rb")
+                except FileNotFoundError:
+                    # Removed from disk behind the cache's back
+                    self._size -= self._files.pop(key)
+                else:
+                    self._files.move_to_end(key)
+                    blob_cache_lookups.inc(labels={"result": "hit"})
+                    return f
+        blob_cache_lookups.inc(labels={"result": "miss"})
+        return None
+
+    def begin_fill(self, name: str, generation: Optional[int]):
+        """
+        Reserve a fill of the cache for a blob.
+
+        Returns:
+            An open temporary file to write the blob into, or None if the blob
+            is already cached or being filled by another request
+        """
+        key = self._key(name, generation)
+        with self._lock:
+            if key in self._files or key in self._filling:
+                return None
+            self._filling.add(key)
+        os.makedirs(self.directory, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False)
+
+    def commit_fill(self, name: str, generation: Optional[int], tmp) -> None:
+        """Move a completely written temporary file into the cache."""
+        key = self._key(name, generation)
+        tmp.close()
+        size = os.path.getsize(tmp.name)
+        os.replace(tmp.name, os.path.join(self.directory, key))
+        with self._lock:
+            self._filling.discard(key)
+            self._files[key] = size
+            self._size += size
+        self._evict()
+
+    def abort_fill(self, name: str, generation: Optional[int], tmp) -> None:
+        """Discard a partially written temporary file."""
+        tmp.close()
+        try:
+            os.unlink(tmp.name)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._filling.discard(self._key(name, generation))
+
+    def _evict(self) -> None:
+        while True:
+            with self._lock:
+                if self._size <= self.max_bytes or not self._files:
+                    return
+                key, size = self._files.popitem(last=False)
+                self._size -= size
+            # Open readers keep working on the unlinked file
+            try:
+                os.unlink(os.path.join(self.directory, key))
+            except FileNotFoundError:
+                pass
+            blob_cache_evictions.inc()
+
+    @staticmethod
+    def _key(name: str, generation: Optional[int]) -> str:
+        return f"{hashlib.sha256(name.encode()).hexdigest()}-{generation or 0}"
@@ -0,0 +1,58 @@
+"""
+Pick the bcrypt cost factor for this machine.
+
+Hashes a sample password at increasing cost factors and reports the
+largest one whose median hash time fits the latency budget. Run it on the
+target hardware (e.g. as a one-off job with the same CPU limit as the
+service) and set the result as BCRYPT_ROUNDS.
+
+Usage (from the app directory):
+    python calibrate_bcrypt.py [--budget-ms 250] [--samples 5]
+"""
+import argparse
+import statistics
+import time
+
+from passlib.hash import bcrypt
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+def measure(rounds: int, samples: int) -> float:
+    """Median time in milliseconds to hash a password at the given cost."""
+    hasher = bcrypt.using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.hash("calibration-Passw0rd!")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(budget_ms: float, samples: int) -> int:
+    chosen = MIN_ROUNDS
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        elapsed = measure(rounds, samples)
+        fits = elapsed <= budget_ms
+        print(f"rounds={rounds:2d}  {elapsed:8.1f} ms  {'ok' if fits else 'over budget'}")
+        if not fits:
+            if rounds == MIN_ROUNDS:
+                print(f"Even the minimum cost ({MIN_ROUNDS}) exceeds the budget; using it anyway.")
+            break
+        chosen = rounds
+    return chosen
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=250, help="Target time of one hash in milliseconds")
+    parser.add_argument("--samples", type=int, default=5, help="Hashes measured per cost factor")
+    args = parser.parse_args()
+
+    rounds = calibrate(args.budget_ms, args.samples)
+    print(f"BCRYPT_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()
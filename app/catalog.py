@@ -0,0 +1,308 @@
+import asyncio
+import bisect
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from db import get_redis_client
+from metrics import registry
+from storage import AsyncStorage
+
+# Catalog configuration
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+CATALOG_REDIS_TTL_SECONDS = int(os.getenv("CATALOG_REDIS_TTL_SECONDS", "86400"))
+
+# Metrics
+catalog_requests = registry.counter(
+    "materials_catalog_requests_total",
+    "Catalog lookups by result (hit, stale, miss)"
+)
+catalog_refreshes = registry.counter(
+    "materials_catalog_refreshes_total",
+    "Catalog refresh attempts by source and outcome"
+)
+catalog_refresh_seconds = registry.histogram(
+    "materials_catalog_refresh_seconds",
+    "Time spent listing the bucket to rebuild the catalog"
+)
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """Metadata for a single PDF blob in the materials bucket."""
+    name: str
+    size: Optional[int]
+    updated: Optional[datetime]
+    generation: Optional[int]
+    content_type: Optional[str] = None
+
+    def to_list(self) -> List[Any]:
+        return [
+            self.name,
+            self.size,
+            self.updated.isoformat() if self.updated else None,
+            self.generation,
+            self.content_type
+        ]
+
+    @classmethod
+    def from_list(cls, item: List[Any]) -> "CatalogEntry":
+        # Older snapshots in Redis have no content type
+        name, size, updated, generation, *rest = item
+        return cls(
+            name=name,
+            size=size,
+            updated=datetime.fromisoformat(updated) if updated else None,
+            generation=generation,
+            content_type=rest[0] if rest else None
+        )
+
+
+class MaterialsCatalog:
+    """
+    In-memory snapshot of the PDF blobs in the materials bucket.
+
+    The snapshot is rebuilt by a background task every
+    ``CATALOG_REFRESH_SECONDS`` and mirrored to Redis so that freshly started
+    instances can serve from a warm copy. Readers always get the current
+    snapshot immediately; a stale snapshot triggers a refresh in the
+    background instead of blocking the request (stale-while-revalidate),
+    so the listing keeps answering while GCS is slow or unavailable.
+    """
+
+    def __init__(
+        self,
+        storage: AsyncStorage,
+        refresh_interval: float = CATALOG_REFRESH_SECONDS
+    ):
+        self.storage = storage
+        self.refresh_interval = refresh_interval
+        self.redis_key = f"materials:catalog:{storage.bucket_name}"
+
+        self._entries: Tuple[CatalogEntry, ...] = ()
+        self._names: Tuple[str, ...] = ()
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+        self._revalidate_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        # Client override for tests; the shared pool client otherwise
+        self._redis: Optional[redis.Redis] = None
+        self._listeners: List[Callable[[Tuple[CatalogEntry, ...]], Awaitable[None]]] = []
+        # Latest snapshot not yet handed to each listener, and its delivery task
+        self._pending: Dict[int, Tuple[CatalogEntry, ...]] = {}
+        self._listener_tasks: Dict[int, asyncio.Task] = {}
+
+        registry.gauge("materials_catalog_age_seconds", "Age of the catalog snapshot", self.age)
+        registry.gauge("materials_catalog_entries", "Number of PDF blobs in the catalog", lambda: len(self._entries))
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def age(self) -> float:
+        """Seconds since the snapshot was built, or -1 if there is none."""
+        if self._loaded_at is None:
+            return -1
+        return max(0.0, time.time() - self._loaded_at)
+
+    async def get_entries(self) -> Tuple[CatalogEntry, ...]:
+        """
+        Return the current snapshot, sorted by blob name.
+
+        Only the very first call on a cold instance waits for the bucket to be
+        listed; afterwards a stale snapshot is served while a refresh runs in
+        the background.
+        """
+        if self._loaded_at is None:
+            catalog_requests.inc(labels={"result": "miss"})
+            await self.refresh()
+            return self._entries
+
+        if self.age() > self.refresh_interval:
+            catalog_requests.inc(labels={"result": "stale"})
+            self._schedule_revalidate()
+        else:
+            catalog_requests.inc(labels={"result": "hit"})
+        return self._entries
+
+    async def get_page(
+        self,
+        limit: int,
+        after: Optional[str] = None
+    ) -> Tuple[Tuple[CatalogEntry, ...], int, int]:
+        """
+        Return one page of the snapshot in name order.
+
+        Args:
+            limit: Maximum number of entries to return
+            after: Return entries whose name sorts after this one
+
+        Returns:
+            Tuple of (entries, offset of the first entry, total entries)
+        """
+        await self.get_entries()
+        # Both tuples are swapped together in _set, with no await in between
+        entries, names = self._entries, self._names
+        start = bisect.bisect_right(names, after) if after is not None else 0
+        return entries[start:start + limit], start, len(entries)
+
+    def get_entry(self, name: str) -> Optional[CatalogEntry]:
+        """Look up a single blob in the current snapshot without triggering a refresh."""
+        entries, names = self._entries, self._names
+        i = bisect.bisect_left(names, name)
+        if i < len(names) and names[i] == name:
+            return entries[i]
+        return None
+
+    async def refresh(self) -> None:
+        """Rebuild the snapshot, preferring a fresh copy published by another instance."""
+        started_at = time.time()
+        async with self._refresh_lock:
+            # Another coroutine refreshed while we were waiting for the lock
+            if self._loaded_at is not None and self._loaded_at >= started_at:
+                return
+
+            if await self.load_from_redis(max_age=self.refresh_interval):
+                return
+
+            try:
+                with catalog_refresh_seconds.time():
+                    entries = await self._list_pdf_blobs()
+            except Exception:
+                catalog_refreshes.inc(labels={"source": "gcs", "outcome": "error"})
+                raise
+
+            self._set(entries, time.time())
+            catalog_refreshes.inc(labels={"source": "gcs", "outcome": "ok"})
+            await self._store_in_redis()
+
+    async def load_from_redis(self, max_age: Optional[float] = None) -> bool:
+        """
+        Adopt the snapshot stored in Redis if it is newer than ours.
+
+        Args:
+            max_age: Ignore the Redis copy if it is older than this many seconds
+
+        Returns:
+            bool: True if the Redis copy was adopted
+        """
+        try:
+            raw = await self._get_redis().get(self.redis_key)
+        except Exception as e:
+            print(f"Catalog: could not read snapshot from Redis: {e}")
+            return False
+        if not raw:
+            return False
+
+        data = json.loads(raw)
+        loaded_at = data["loaded_at"]
+        if self._loaded_at is not None and loaded_at <= self._loaded_at:
+            return False
+        if max_age is not None and time.time() - loaded_at > max_age:
+            return False
+
+        self._set(tuple(CatalogEntry.from_list(item) for item in data["entries"]), loaded_at)
+        catalog_refreshes.inc(labels={"source": "redis", "outcome": "ok"})
+        return True
+
+    def add_listener(self, listener: Callable[[Tuple[CatalogEntry, ...]], Awaitable[None]]) -> None:
+        """
+        Call ``listener`` in the background whenever the snapshot changes, e.g. to sync derived indexes.
+
+        Calls for one listener never overlap; snapshots that arrive while it
+        is running are coalesced and only the latest one is delivered next.
+        """
+        self._listeners.append(listener)
+
+    async def start(self) -> None:
+        """Warm the snapshot from Redis and start the background refresh loop."""
+        await self.load_from_redis()
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop background work."""
+        for task in (self._loop_task, self._revalidate_task, *self._listener_tasks.values()):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._loop_task = None
+        self._revalidate_task = None
+        self._listener_tasks.clear()
+        self._pending.clear()
+
+    def _set(self, entries: Tuple[CatalogEntry, ...], loaded_at: float) -> None:
+        # Swap the whole tuple so readers never observe a partial snapshot
+        entries = tuple(sorted(entries, key=lambda entry: entry.name))
+        changed = self._loaded_at is None or entries != self._entries
+        self._entries, self._names = entries, tuple(entry.name for entry in entries)
+        self._loaded_at = loaded_at
+
+        if not changed:
+            return
+        for i in range(len(self._listeners)):
+            self._pending[i] = entries
+            task = self._listener_tasks.get(i)
+            if task is None or task.done():
+                self._listener_tasks[i] = asyncio.create_task(self._notify(i))
+
+    async def _notify(self, i: int) -> None:
+        listener = self._listeners[i]
+        while i in self._pending:
+            entries = self._pending.pop(i)
+            try:
+                await listener(entries)
+            except Exception as e:
+                print(f"Catalog: listener {getattr(listener, '__qualname__', listener)} failed: {e}")
+
+    async def _list_pdf_blobs(self) -> Tuple[CatalogEntry, ...]:
+        blobs = await self.storage.list_blobs()
+        return tuple(
+            CatalogEntry(
+                name=blob.name,
+                size=blob.size,
+                updated=blob.updated,
+                generation=blob.generation,
+                content_type=blob.content_type
+            )
+            for blob in blobs
+            if blob.name.lower().endswith('.pdf')
+        )
+
+    async def _store_in_redis(self) -> None:
+        payload = json.dumps({
+            "loaded_at": self._loaded_at,
+            "entries": [entry.to_list() for entry in self._entries]
+        })
+        try:
+            await self._get_redis().set(self.redis_key, payload, ex=CATALOG_REDIS_TTL_SECONDS)
+        except Exception as e:
+            print(f"Catalog: could not store snapshot in Redis: {e}")
+
+    def _get_redis(self) -> redis.Redis:
+        return self._redis if self._redis is not None else get_redis_client()
+
+    def _schedule_revalidate(self) -> None:
+        if self._revalidate_task is None or self._revalidate_task.done():
+            self._revalidate_task = asyncio.create_task(self._refresh_quietly())
+
+    async def _refresh_quietly(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            print(f"Catalog: refresh failed, serving stale snapshot: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            if self.storage.available:
+                await self._refresh_quietly()
+            await asyncio.sleep(self.refresh_interval)
+
@@ -1,7 +1,17 @@
+import asyncio
 import os
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from metrics import registry
 
 # Get database configuration from environment variables
 DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -13,21 +23,199 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = os.getenv("REDIS_PORT", "6379")
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "")
+# Connections shared by every Redis user in the process (pub/sub listeners hold one each)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+# How long a command waits for a free connection before failing
+REDIS_POOL_TIMEOUT_SECONDS = float(os.getenv("REDIS_POOL_TIMEOUT_SECONDS", "2"))
+# Idle connections are PINGed before reuse after this many seconds
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "5"))
+# Commands sent per round trip by pipelined()
+REDIS_PIPELINE_BATCH = int(os.getenv("REDIS_PIPELINE_BATCH", "500"))
 
-# Create async database engine
-if DB_HOST and DB_HOST.startswith("/cloudsql/"):
-    # Connecting via Cloud SQL Unix socket
-    DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@/{DB_NAME}?host={DB_HOST}"
-else:
+# Optional read replica for read-only dependencies (same credentials and database)
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST", "")
+# How long reads for a just-modified user stay on the primary
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv("REPLICA_READ_YOUR_WRITES_SECONDS", "10"))
+
+def database_url(host: str) -> str:
+    if host and host.startswith("/cloudsql/"):
+        # Connecting via Cloud SQL Unix socket
+        return f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@/{DB_NAME}?host={host}"
     # Fallback for local development (assuming DB_HOST is a regular hostname/IP then)
     # Ensure you have DB_PORT environment variable set for local TCP connections
-    DB_PORT = os.getenv("DB_PORT", "5432") 
-    DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    db_port = os.getenv("DB_PORT", "5432")
+    return f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{host}:{db_port}/{DB_NAME}"
+
+# Connection pool sizing, per engine and instance. Keep
+# instances x (DB_POOL_SIZE + DB_MAX_OVERFLOW) below Cloud SQL's max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections older than this are replaced (Cloud SQL drops long-idle connections)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test connections with a round trip before handing them out
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Expose per-request database time to clients in a Server-Timing header;
+# internal timing, so only for debugging (the metrics always have it)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Pool and query metrics per engine
+_pool_checked_out = registry.gauge("db_pool_checked_out", "Connections currently checked out, by engine")
+_pool_size = registry.gauge("db_pool_size", "Connections held open by the pool, by engine")
+_pool_overflow = registry.gauge("db_pool_overflow", "Connections above the pool size currently open, by engine")
+db_pool_wait_seconds = registry.histogram(
+    "db_pool_wait_seconds",
+    "Time to obtain a usable pooled connection (waiting, connecting, pre-ping), by engine"
+)
+db_pool_timeouts = registry.counter(
+    "db_pool_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT, by engine"
+)
+db_connection_age_seconds = registry.histogram(
+    "db_connection_age_seconds",
+    "Age of database connections when checked out, by engine",
+    buckets=(1, 10, 60, 300, 600, 1200, 1800, 3600, 7200)
+)
+db_request_seconds = registry.histogram(
+    "http_request_db_seconds",
+    "Database time (queries and pool waits) per request, by route"
+)
+db_connection_hold_seconds = registry.histogram(
+    "db_connection_hold_seconds",
+    "Time from checkout to checkin of a pooled connection, by route (background outside requests)"
+)
+db_reads = registry.counter("db_read_sessions_total", "Read-only sessions opened, by engine they were routed to")
+
+
+class RequestDBTime:
+    """Database time accumulated while serving one request."""
+
+    __slots__ = ("scope", "queries", "query_seconds", "wait_seconds")
+
+    def __init__(self, scope: Optional[Dict[str, Any]] = None):
+        self.scope = scope
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    @property
+    def seconds(self) -> float:
+        return self.query_seconds + self.wait_seconds
+
+    @property
+    def route(self) -> str:
+        """Path template of the matched route (set by the router before the endpoint runs)."""
+        route = self.scope.get("route") if self.scope is not None else None
+        return route.path if route is not None else "unmatched"
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header."""
+        return (
+            f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries", '
+            f"db-pool;dur={self.wait_seconds * 1000:.1f}"
+        )
+
+
+_request_db_time: ContextVar[Optional[RequestDBTime]] = ContextVar("request_db_time", default=None)
+
+def start_request_timing(scope: Optional[Dict[str, Any]] = None) -> RequestDBTime:
+    """Attribute database time in the current context (one request) to a new counter."""
+    timing = RequestDBTime(scope)
+    _request_db_time.set(timing)
+    return timing
+
+
+def _timed_pool_class(name: str):
+    class TimedQueuePool(AsyncAdaptedQueuePool):
+        """Queue pool that records how long checkouts take."""
+
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                return super().connect()
+            except SQLAlchemyTimeoutError:
+                db_pool_timeouts.inc(labels={"engine": name})
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                db_pool_wait_seconds.observe(elapsed, labels={"engine": name})
+                timing = _request_db_time.get()
+                if timing is not None:
+                    timing.wait_seconds += elapsed
+
+    return TimedQueuePool
+
+
+def pool_options(name: str) -> Dict[str, Any]:
+    """create_async_engine arguments for an instrumented, configured pool."""
+    return {
+        "poolclass": _timed_pool_class(name),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def instrument_engine(name: str, instrumented: AsyncEngine) -> None:
+    """Export pool gauges and connection ages, and time queries per request."""
+    labels = {"engine": name}
+    # Read the pool through the engine, which replaces it on dispose()
+    _pool_checked_out.track(lambda: instrumented.pool.checkedout(), labels=labels)
+    _pool_size.track(lambda: instrumented.pool.size(), labels=labels)
+    _pool_overflow.track(lambda: max(0, instrumented.pool.overflow()), labels=labels)
+
+    sync_engine = instrumented.sync_engine
+
+    @event.listens_for(sync_engine, "connect")
+    def _connected(dbapi_connection, connection_record):
+        connection_record.info["connected_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checked_out(dbapi_connection, connection_record, connection_proxy):
+        now = time.monotonic()
+        connection_record.info["checked_out_at"] = now
+        connected_at = connection_record.info.get("connected_at")
+        if connected_at is not None:
+            db_connection_age_seconds.observe(now - connected_at, labels=labels)
+
+    @event.listens_for(sync_engine, "checkin")
+    def _checked_in(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is None:
+            return
+        timing = _request_db_time.get()
+        db_connection_hold_seconds.observe(
+            time.monotonic() - checked_out_at,
+            labels={"route": timing.route if timing is not None else "background"}
+        )
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        timing = _request_db_time.get()
+        started = getattr(context, "_query_started", None)
+        if timing is not None and started is not None:
+            timing.queries += 1
+            timing.query_seconds += time.perf_counter() - started
+
+
+# Create async database engine
+DATABASE_URL = database_url(DB_HOST)
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
     future=True,
+    **pool_options("primary")
 )
+instrument_engine("primary", engine)
 
 # Create async session factory
 async_session = sessionmaker(
@@ -36,21 +224,261 @@ async_session = sessionmaker(
     expire_on_commit=False
 )
 
+# Replica engine and session factory, if configured
+replica_engine: Optional[AsyncEngine] = None
+replica_session = None
+if DB_REPLICA_HOST:
+    replica_engine = create_async_engine(
+        database_url(DB_REPLICA_HOST),
+        echo=False,
+        future=True,
+        **pool_options("replica")
+    )
+    instrument_engine("replica", replica_engine)
+    replica_session = sessionmaker(
+        replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+
+# Read-your-writes: users modified recently (by any instance, via the user
+# invalidation channel) are read from the primary until replicas caught up
+_recent_writes: Dict[int, float] = {}
+
+def mark_user_written(*user_ids: int) -> None:
+    """Route reads for these users to the primary for a while."""
+    if replica_session is None:
+        return
+    now = time.monotonic()
+    if len(_recent_writes) > 10000:
+        for user_id, until in list(_recent_writes.items()):
+            if until <= now:
+                del _recent_writes[user_id]
+    for user_id in user_ids:
+        _recent_writes[user_id] = now + REPLICA_READ_YOUR_WRITES_SECONDS
+
+def read_session_factory(user_id: Optional[int] = None):
+    """
+    Session factory for a read-only unit of work.
+
+    Returns the replica factory when a replica is configured and the user
+    the read is for (if any) was not modified recently; otherwise the
+    primary factory.
+    """
+    if replica_session is None:
+        return async_session
+    if user_id is not None and _recent_writes.get(user_id, 0) > time.monotonic():
+        return async_session
+    return replica_session
+
 # Redis connection pool
 redis_url = f"redis://{':' + REDIS_PASSWORD + '@' if REDIS_PASSWORD else ''}{REDIS_HOST}:{REDIS_PORT}/0"
 
 # Function to get a database session
 async def get_db():
+    # Sessions check out a connection on their first query, not here
     async with async_session() as session:
         try:
             yield session
         finally:
             await session.close()
 
+async def warm_db_pool(count: int, target: Optional[AsyncEngine] = None) -> int:
+    """
+    Open up to ``count`` pooled connections at once and return them to the pool.
+
+    Args:
+        count: Connections to open, capped at the pool size (overflow
+            connections would be closed again on checkin)
+        target: Engine to warm; defaults to the primary
+
+    Returns:
+        int: Number of connections opened
+
+    Raises:
+        Exception: The first connection error, after closing the others
+    """
+    target = target if target is not None else engine
+    count = min(count, target.pool.size())
+    results = await asyncio.gather(
+        *(target.connect().start() for _ in range(count)),
+        return_exceptions=True
+    )
+    opened = [result for result in results if not isinstance(result, BaseException)]
+    for connection in opened:
+        await connection.close()
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return len(opened)
+
+async def release_connection(session: AsyncSession) -> None:
+    """
+    Return a session's connection to the pool before slow non-database work.
+
+    Ends the session's transaction, so call it after reads (or after
+    commit). Loaded objects stay usable, detached with their loaded
+    attributes; the session checks out a connection again on its next
+    query.
+
+    Raises:
+        RuntimeError: If the session has unflushed changes
+    """
+    if session.new or session.dirty or session.deleted:
+        raise RuntimeError("release_connection() would discard pending changes")
+    if session.in_transaction():
+        await session.close()
+
+# Redis pool metrics
+redis_pool_wait_seconds = registry.histogram(
+    "redis_pool_wait_seconds",
+    "Time spent waiting for a Redis connection from the shared pool"
+)
+redis_pool_exhausted = registry.counter(
+    "redis_pool_exhausted_total",
+    "Redis commands that failed because no pooled connection became free in time"
+)
+
+
+class InstrumentedRedisPool(redis.BlockingConnectionPool):
+    """
+    BlockingConnectionPool that records acquisition waits and timeouts.
+
+    Connections are taken under the pool's condition but connected outside
+    it. The stock implementation connects while holding the condition and
+    releases a connection that failed to connect by acquiring it again, so
+    with Redis down every command hung for the full pool timeout instead of
+    failing fast.
+    """
+
+    async def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self._condition:
+                    await self._condition.wait_for(self.can_get_connection)
+                    try:
+                        connection = self._available_connections.pop()
+                    except IndexError:
+                        connection = self.make_connection()
+                    self._in_use_connections.add(connection)
+        except asyncio.TimeoutError as e:
+            redis_pool_exhausted.inc()
+            raise RedisConnectionError("No connection available.") from e
+        finally:
+            redis_pool_wait_seconds.observe(time.perf_counter() - started)
+
+        try:
+            await self.ensure_connection(connection)
+        except BaseException:
+            await self.release(connection)
+            raise
+        return connection
+
+
+_redis_pool: Optional[InstrumentedRedisPool] = None
+_redis_client: Optional[redis.Redis] = None
+
+registry.gauge(
+    "redis_pool_in_use",
+    "Redis connections currently checked out of the shared pool",
+    lambda: len(_redis_pool._in_use_connections) if _redis_pool is not None else 0
+)
+registry.gauge(
+    "redis_pool_idle",
+    "Open Redis connections waiting in the shared pool",
+    lambda: len(_redis_pool._available_connections) if _redis_pool is not None else 0
+)
+registry.gauge(
+    "redis_pool_max_connections",
+    "Size limit of the shared Redis pool",
+    lambda: REDIS_MAX_CONNECTIONS
+)
+
+
+def open_redis() -> redis.Redis:
+    """Create the process-wide Redis pool (idempotent); called from the app lifespan."""
+    global _redis_pool, _redis_client
+    if _redis_client is None:
+        _redis_pool = InstrumentedRedisPool.from_url(
+            redis_url,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT_SECONDS,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            socket_connect_timeout=1,
+            socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_keepalive=True,
+            decode_responses=True
+        )
+        _redis_client = redis.Redis(connection_pool=_redis_pool)
+    return _redis_client
+
+
+async def close_redis() -> None:
+    """Close every pooled Redis connection; called on shutdown."""
+    global _redis_pool, _redis_client
+    if _redis_pool is not None:
+        pool, _redis_pool, _redis_client = _redis_pool, None, None
+        await pool.disconnect()
+
+
+def get_redis_client() -> redis.Redis:
+    """The shared Redis client; creates the pool on first use outside the app."""
+    return _redis_client if _redis_client is not None else open_redis()
+
+
+async def pipelined(
+    commands: Iterable[Tuple[Any, ...]],
+    client: Optional[redis.Redis] = None,
+    batch_size: int = REDIS_PIPELINE_BATCH
+) -> List[Any]:
+    """
+    Send raw commands in pipelines, one round trip per ``batch_size`` commands.
+    
+    Args:
+        commands: Commands as tuples, e.g. ("SET", key, value, "EX", 60)
+        client: Client to use; defaults to the shared one
+        batch_size: Commands per round trip
+        
+    Returns:
+        List: One reply per command, in order
+    """
+    client = client if client is not None else get_redis_client()
+    commands = list(commands)
+    replies: List[Any] = []
+    for start in range(0, len(commands), batch_size):
+        async with client.pipeline(transaction=False) as pipe:
+            for command in commands[start:start + batch_size]:
+                pipe.execute_command(*command)
+            replies.extend(await pipe.execute())
+    return replies
+
+
+async def warm_redis_pool(count: int) -> int:
+    """
+    Open up to ``count`` connections of the shared Redis pool and return them.
+
+    Returns:
+        int: Number of connections opened
+
+    Raises:
+        Exception: The first connection error, after releasing the others
+    """
+    pool = get_redis_client().connection_pool
+    count = min(count, pool.max_connections)
+    results = await asyncio.gather(
+        *(pool.get_connection("PING") for _ in range(count)),
+        return_exceptions=True
+    )
+    opened = [result for result in results if not isinstance(result, BaseException)]
+    for connection in opened:
+        await pool.release(connection)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return len(opened)
+
+
 # Function to get a Redis connection
 async def get_redis():
-    r = redis.from_url(redis_url, decode_responses=True)
-    try:
-        yield r
-    finally:
-        await r.aclose()
+    yield get_redis_client()
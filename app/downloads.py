@@ -0,0 +1,166 @@
+import asyncio
+import os
+from mmap import ACCESS_READ, mmap
+from typing import AsyncIterator, BinaryIO, Dict, Optional, Set, Tuple
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from blob_cache import BlobCache
+from metrics import registry
+from storage import AsyncStorage
+
+# Download proxy configuration
+MATERIALS_PROXY_ENABLED = os.getenv("MATERIALS_PROXY_ENABLED", "false").lower() == "true"
+DOWNLOAD_CHUNK_BYTES = int(os.getenv("DOWNLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# Metrics
+download_bytes = registry.counter(
+    "material_download_bytes_total",
+    "Bytes sent by the download proxy, by source (cache, gcs)"
+)
+
+# Background cache fills started by range requests
+_fill_tasks: Set[asyncio.Task] = set()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range`` header.
+
+    Args:
+        header: Value of the Range header, if any
+        size: Size of the blob in bytes
+
+    Returns:
+        (start, end) inclusive, or None to send the whole blob
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        # Unknown units and multipart ranges are answered with the whole blob
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError("empty suffix range")
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError(f"malformed range: {header}")
+    if start >= size or end < start:
+        raise ValueError(f"unsatisfiable range: {header}")
+    return start, min(end, size - 1)
+
+
+class CachedFileResponse(Response):
+    """
+    Serve a byte range of a locally cached file.
+
+    Takes a file already opened with ``BlobCache.open``, so the response only
+    starts once the bytes are known to be readable. Uses the ASGI zero-copy
+    extension (sendfile) when the server offers it; otherwise the file is
+    memory-mapped and sent in fixed-size chunks, so memory use does not
+    depend on the file size.
+    """
+
+    def __init__(self, file: BinaryIO, start: int, end: int, status_code: int, headers: Dict[str, str], media_type: str):
+        self.file = file
+        self.start = start
+        self.end = end
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        with self.file as f:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            count = self.end - self.start + 1
+            if scope["method"] == "HEAD" or count <= 0:
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": f,
+                    "offset": self.start,
+                    "count": count,
+                })
+            else:
+                with mmap(f.fileno(), 0, access=ACCESS_READ) as mapped:
+                    position = self.start
+                    while position <= self.end:
+                        stop = min(position + DOWNLOAD_CHUNK_BYTES, self.end + 1)
+                        await send({
+                            "type": "http.response.body",
+                            "body": mapped[position:stop],
+                            "more_body": stop <= self.end,
+                        })
+                        position = stop
+        download_bytes.inc(count, labels={"source": "cache"})
+
+
+async def stream_from_storage(
+    storage: AsyncStorage,
+    cache: BlobCache,
+    name: str,
+    generation: Optional[int],
+    start: int,
+    end: int,
+    fill=None
+) -> AsyncIterator[bytes]:
+    """
+    Stream a byte range of a blob from GCS in ``DOWNLOAD_CHUNK_BYTES`` chunks.
+
+    ``fill`` is a cache fill reserved with ``BlobCache.begin_fill`` (whole-blob
+    requests only): the chunks are also written to it, and it is committed
+    once the last one was sent.
+    """
+    committed = False
+    try:
+        position = start
+        while position <= end:
+            stop = min(position + DOWNLOAD_CHUNK_BYTES - 1, end)
+            chunk = await storage.download_range(name, position, stop, generation)
+            if fill is not None:
+                await asyncio.to_thread(fill.write, chunk)
+            download_bytes.inc(len(chunk), labels={"source": "gcs"})
+            yield chunk
+            position = stop + 1
+        if fill is not None:
+            await asyncio.to_thread(cache.commit_fill, name, generation, fill)
+            committed = True
+    finally:
+        # Also runs when the client disconnects mid-stream
+        if fill is not None and not committed:
+            cache.abort_fill(name, generation, fill)
+
+
+def schedule_cache_fill(storage: AsyncStorage, cache: BlobCache, name: str, generation: Optional[int], size: int) -> None:
+    """Download a whole blob into the cache in the background (used after range misses)."""
+    fill = cache.begin_fill(name, generation)
+    if fill is None:
+        # Already cached or being filled
+        return
+
+    async def run_fill():
+        try:
+            async for _ in stream_from_storage(storage, cache, name, generation, 0, size - 1, fill=fill):
+                pass
+        except Exception as e:
+            print(f"Download cache: could not fill {name}: {e}")
+
+    task = asyncio.create_task(run_fill())
+    _fill_tasks.add(task)
+    task.add_done_callback(_fill_tasks.discard)
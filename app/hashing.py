@@ -0,0 +1,165 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from metrics import registry
+
+# Bcrypt cost factor; measure it on the target machine with calibrate_bcrypt.py
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Password hashing. Hashes with any other cost are reported by needs_update
+# and replaced at the user's next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# Hashing pool configuration
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 1)))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", str(4 * BCRYPT_WORKERS)))
+BCRYPT_RETRY_AFTER_SECONDS = int(os.getenv("BCRYPT_RETRY_AFTER_SECONDS", "1"))
+# Passwords hashed per pool task by bulk operations; an interactive hash
+# may wait for one chunk, so keep it to a few hundred milliseconds of work
+BCRYPT_BULK_CHUNK = int(os.getenv("BCRYPT_BULK_CHUNK", "1"))
+
+# Metrics
+hash_queue_depth = registry.gauge(
+    "password_hash_queue_depth",
+    "Password hash operations waiting for a free worker"
+)
+hash_seconds = registry.histogram(
+    "password_hash_seconds",
+    "Latency of password hash operations including queueing, by operation"
+)
+hash_rejections = registry.counter(
+    "password_hash_rejections_total",
+    "Password hash operations rejected because the queue was full"
+)
+
+
+# The functions below run in the hashing processes
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+def _hash_many(passwords: List[str], rounds: int) -> List[str]:
+    hasher = pwd_context.handler("bcrypt").using(rounds=rounds)
+    return [hasher.hash(password) for password in passwords]
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated process pool with admission control.
+
+    At most ``workers`` hashes run at once and ``max_queue`` more may wait;
+    beyond that requests are rejected immediately with 503 and Retry-After
+    instead of piling up, so a login burst cannot freeze the event loop or
+    grow latency without bound.
+    """
+
+    def __init__(self, workers: int = BCRYPT_WORKERS, max_queue: int = BCRYPT_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._executor is None:
+            # Spawned (not forked) workers: the parent runs an event loop and threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def hash(self, password: str) -> str:
+        """Hash a password for storing."""
+        return await self._submit("hash", _hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password against a hash."""
+        return await self._submit("verify", _verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password and rehash it if the stored hash is off-target.
+
+        Returns:
+            (valid, new_hash): ``new_hash`` is a replacement hash with the
+            configured cost when the password is valid but the stored hash
+            needs an update, otherwise None
+        """
+        return await self._submit("verify", _verify_and_update, password, hashed_password)
+
+    async def hash_many(self, passwords: List[str], rounds: int = BCRYPT_ROUNDS) -> List[str]:
+        """
+        Hash many passwords, spread over all workers but one.
+
+        Passwords are hashed in chunks of ``BCRYPT_BULK_CHUNK``. One worker is
+        kept free for interactive logins and signups when there is more than
+        one; otherwise they wait for at most the chunk in progress, since at
+        most one chunk per bulk worker is queued at a time. Bulk work waits
+        for capacity instead of being rejected.
+
+        Args:
+            passwords: Plain-text passwords
+            rounds: bcrypt cost; hashes below ``BCRYPT_ROUNDS`` are upgraded
+                at the user's first login
+
+        Returns:
+            The hashes, in the order of ``passwords``
+        """
+        slots = asyncio.Semaphore(max(1, self.workers - 1))
+
+        async def hash_chunk(chunk: List[str]) -> List[str]:
+            async with slots:
+                return await self._submit("hash_many", _hash_many, chunk, rounds, admit=False)
+
+        chunks = [passwords[i:i + BCRYPT_BULK_CHUNK] for i in range(0, len(passwords), BCRYPT_BULK_CHUNK)]
+        results = await asyncio.gather(*(hash_chunk(chunk) for chunk in chunks))
+        return [hashed for chunk in results for hashed in chunk]
+
+    async def _submit(self, op: str, fn: Callable[..., Any], *args, admit: bool = True) -> Any:
+        if admit and self._pending >= self.workers + self.max_queue:
+            hash_rejections.inc(labels={"op": op})
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": str(BCRYPT_RETRY_AFTER_SECONDS)},
+            )
+
+        self.start()
+        self._pending += 1
+        hash_queue_depth.set(max(0, self._pending - self.workers))
+        try:
+            with hash_seconds.time(labels={"op": op}):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+            hash_queue_depth.set(max(0, self._pending - self.workers))
+
+
+# Process-wide hasher used by the auth routes
+password_hasher = PasswordHasher()
@@ -0,0 +1,192 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, String, and_, case, column, update, values
+
+from db import async_session
+from metrics import registry
+from models import User
+
+# Write-behind configuration
+LAST_LOGIN_FLUSH_SECONDS = float(os.getenv("LAST_LOGIN_FLUSH_SECONDS", "5"))
+LAST_LOGIN_BATCH_SIZE = int(os.getenv("LAST_LOGIN_BATCH_SIZE", "500"))
+
+# Metrics
+last_login_flushes = registry.counter(
+    "last_login_flushes_total",
+    "Batched last_login flushes by outcome (ok, error)"
+)
+last_login_flush_rows = registry.counter(
+    "last_login_flush_rows_total",
+    "User rows updated by last_login flushes"
+)
+last_login_flush_seconds = registry.histogram(
+    "last_login_flush_seconds",
+    "Duration of one batched last_login UPDATE"
+)
+
+
+def bulk_update_statement(rows: List[Tuple[int, datetime, Optional[str], Optional[str]]]):
+    """
+    One ``UPDATE users ... FROM (VALUES ...)`` for a batch of logins.
+
+    A replacement hash is only written while the stored hash is still the
+    one it was verified against, so a password changed before the flush is
+    never rolled back.
+
+    Args:
+        rows: (user id, login time, replacement hash or None, verified hash or None) per user
+    """
+    pending = values(
+        column("id", Integer),
+        column("last_login", DateTime(timezone=True)),
+        column("hashed_password", String),
+        column("old_hash", String),
+        name="pending"
+    ).data(rows)
+    return (
+        update(User)
+        .where(User.id == pending.c.id)
+        .values(
+            last_login=pending.c.last_login,
+            hashed_password=case(
+                (
+                    and_(
+                        pending.c.hashed_password.is_not(None),
+                        User.hashed_password == pending.c.old_hash
+                    ),
+                    pending.c.hashed_password
+                ),
+                else_=User.hashed_password
+            )
+        )
+    )
+
+
+class LastLoginBuffer:
+    """
+    Write-behind buffer for login bookkeeping.
+
+    ``record`` only updates an in-process dict; a background task writes the
+    pending rows every ``LAST_LOGIN_FLUSH_SECONDS`` (or as soon as
+    ``LAST_LOGIN_BATCH_SIZE`` users are pending) with one
+    ``UPDATE users ... FROM (VALUES ...)`` statement. Rehashed passwords
+    from login ride along in the same statement. Failed batches are merged
+    back and retried, and ``stop`` flushes whatever is left.
+
+    Cached principals are not invalidated by a flush: none of the fields
+    used for authorization change, and a cached ``last_login`` may lag.
+
+    Only the latest login per user is kept, so a lost batch (crash before a
+    flush) costs at most a few seconds of last_login accuracy and a rehash
+    that is simply redone at the next login.
+    """
+
+    def __init__(
+        self,
+        session_factory=async_session,
+        interval: float = LAST_LOGIN_FLUSH_SECONDS,
+        batch_size: int = LAST_LOGIN_BATCH_SIZE
+    ):
+        self._session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._pending: Dict[int, Tuple[datetime, Optional[str], Optional[str]]] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        registry.gauge(
+            "last_login_buffer_size",
+            "Users whose login is waiting to be written",
+            lambda: len(self._pending)
+        )
+
+    def record(
+        self,
+        user_id: int,
+        logged_in_at: datetime,
+        new_hash: Optional[str] = None,
+        old_hash: Optional[str] = None
+    ) -> None:
+        """
+        Queue a login, optionally with a replacement password hash.
+
+        Args:
+            user_id: User who logged in
+            logged_in_at: Login time
+            new_hash: Hash of the password with the current bcrypt cost
+            old_hash: Stored hash the password was verified against
+        """
+        previous = self._pending.get(user_id)
+        if previous is not None and new_hash is None:
+            new_hash, old_hash = previous[1], previous[2]
+        self._pending[user_id] = (logged_in_at, new_hash, old_hash)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write all pending logins; returns the number of rows written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            # Stable order keeps concurrent flushes from deadlocking on row locks
+            rows = [(user_id, *batch[user_id]) for user_id in sorted(batch)]
+
+            try:
+                with last_login_flush_seconds.time():
+                    async with self._session_factory() as session:
+                        # Batches that grew during an outage stay below the bind parameter limit
+                        for start in range(0, len(rows), self.batch_size):
+                            await session.execute(
+                                bulk_update_statement(rows[start:start + self.batch_size]),
+                                execution_options={"synchronize_session": False}
+                            )
+                        await session.commit()
+            except Exception:
+                last_login_flushes.inc(labels={"outcome": "error"})
+                # Put the batch back without overwriting newer logins
+                for user_id, entry in batch.items():
+                    self._pending.setdefault(user_id, entry)
+                raise
+
+            last_login_flushes.inc(labels={"outcome": "ok"})
+            last_login_flush_rows.inc(len(rows))
+        return len(rows)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write what is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Last login: final flush failed, {len(self._pending)} login(s) lost: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Last login: flush failed, will retry: {e}")
+
+
+# Process-wide buffer used by the login route
+last_login_buffer = LastLoginBuffer()
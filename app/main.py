@@ -1,19 +1,39 @@
 import os
+import asyncio
 from fastapi import FastAPI, Depends, HTTPException, Request, status, APIRouter, Security
 from builtins import anext
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
+from fastapi.responses import FileResponse, RedirectResponse, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import Optional, List, Dict, Any
 
-from db import get_db, engine, async_session
+from db import (
+    SERVER_TIMING_ENABLED,
+    close_redis,
+    db_request_seconds,
+    get_db,
+    engine,
+    async_session,
+    open_redis,
+    replica_engine,
+    start_request_timing,
+    warm_db_pool,
+    warm_redis_pool
+)
+from hashing import password_hasher
+from login_buffer import last_login_buffer
+from metrics import registry
 from models import Base, User
-from routers import auth, materials, users
+from rate_limit import rate_limiter
+from revocation import token_revocations
+from routers import admin, auth, materials, users
 from schemas import UserResponse, Token
+from user_cache import user_cache
 from utils import (
     get_current_user,
     get_password_hash,
@@ -21,6 +41,95 @@ from utils import (
     get_current_active_user,
     get_current_admin_user
 )
+from warmup import WARMUP_DB_CONNECTIONS, WARMUP_REDIS_CONNECTIONS, readiness
+
+async def warm_database() -> str:
+    opened = await warm_db_pool(WARMUP_DB_CONNECTIONS)
+    if replica_engine is not None:
+        await warm_db_pool(WARMUP_DB_CONNECTIONS, replica_engine)
+    return f"{opened} connection(s)"
+
+async def warm_storage() -> str:
+    if not materials.storage.available:
+        return "no GCS client"
+    await materials.storage.warm_up()
+    return "credentials and connection"
+
+async def warm_catalog() -> str:
+    # Load the snapshot (from Redis, else the bucket) and start the background refresh
+    await materials.catalog.start()
+    if not materials.catalog.loaded:
+        await materials.catalog.refresh()
+    return f"{len(await materials.catalog.get_entries())} material(s)"
+
+# Start shared resources and background tasks on startup, release them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One Redis connection pool for the whole process
+    open_redis()
+
+    # Create tables if they don't exist
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    # Create a default admin user if no users exist
+    db_gen = get_db()
+    try:
+        db = await anext(db_gen)
+        result = await db.execute(select(User))
+        if not result.scalars().first():
+            hashed_password = get_password_hash("admin123")
+            admin_user = User(
+                email="admin@example.com",
+                hashed_password=hashed_password,
+                is_admin=True
+            )
+            db.add(admin_user)
+            await db.commit()
+            print("Created default admin user: admin@example.com / admin123")
+    except StopAsyncIteration:
+        pass
+    finally:
+        await db_gen.aclose()
+    
+    # Open the on-disk search index before the catalog starts feeding it
+    await materials.search_index.start()
+    await asyncio.to_thread(materials.blob_cache.load)
+
+    # Pay for connection setup, credentials and the catalog before the
+    # first request does; /ready reports ready once this has finished and
+    # the database could be reached
+    await readiness.warm_up({
+        "database": warm_database,
+        "redis": lambda: warm_redis_pool(WARMUP_REDIS_CONNECTIONS),
+        "storage": warm_storage,
+        "catalog": warm_catalog
+    })
+
+    # Spawn the password hashing workers before the first login arrives
+    password_hasher.start()
+
+    # Follow user changes and token revocations made by other instances
+    await user_cache.start()
+    await token_revocations.start()
+
+    # Write login timestamps in batches
+    await last_login_buffer.start()
+
+    yield
+
+    # Fail readiness checks first so no new traffic arrives while draining
+    await readiness.stop()
+    await last_login_buffer.stop()
+    await token_revocations.stop()
+    await rate_limiter.close()
+    await user_cache.stop()
+    password_hasher.shutdown()
+    await materials.catalog.stop()
+    materials.search_index.shutdown()
+    materials.storage.shutdown()
+    # Last, since everything above may still talk to Redis
+    await close_redis()
 
 # Create FastAPI app
 app = FastAPI(
@@ -29,7 +138,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -41,13 +151,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Attribute database time to each request, for pool sizing (and, when
+# debugging, in the browser's timing panel)
+@app.middleware("http")
+async def db_timing(request: Request, call_next):
+    timing = start_request_timing(request.scope)
+    response = await call_next(request)
+    db_request_seconds.observe(timing.seconds, labels={"route": timing.route})
+    if SERVER_TIMING_ENABLED:
+        response.headers.append("Server-Timing", timing.server_timing())
+    return response
+
 # Include API routers with prefix
 api_router = APIRouter(prefix="/api")
 api_router.include_router(auth.router)
 api_router.include_router(materials.router)
 api_router.include_router(users.router)
+api_router.include_router(admin.router)
 app.include_router(api_router)
 
+# Metrics endpoint (Prometheus text format), registered before the SPA catch-all
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Expose in-process metrics"""
+    return PlainTextResponse(registry.render())
+
+# Probes, registered before the SPA catch-all
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return {"status": "healthy"}
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness: 503 until startup warmup finished, while a required step is failing and while shutting down"""
+    if readiness.ready:
+        state = "ready"
+    else:
+        state = "unavailable" if readiness.finished else "starting"
+    content = {"status": state, "warmup": readiness.steps}
+    return JSONResponse(
+        content=content,
+        status_code=status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -65,35 +212,3 @@ async def catch_all(full_path: str):
     # Otherwise, serve the index.html for SPA routing
     return FileResponse("static/index.html")
 
-# Create database tables on startup
-@app.on_event("startup")
-async def startup():
-    # Create tables if they don't exist
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    # Create a default admin user if no users exist
-    db_gen = get_db()
-    try:
-        db = await anext(db_gen)
-        result = await db.execute(select(User))
-        if not result.scalars().first():
-            hashed_password = get_password_hash("admin123")
-            admin_user = User(
-                email="admin@example.com",
-                hashed_password=hashed_password,
-                is_admin=True
-            )
-            db.add(admin_user)
-            await db.commit()
-            print("Created default admin user: admin@example.com / admin123")
-    except StopAsyncIteration:
-        pass
-    finally:
-        await db_gen.aclose()
-
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
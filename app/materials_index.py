@@ -0,0 +1,207 @@
+import asyncio
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog import CatalogEntry
+from db import async_session
+from metrics import registry
+from models import Material
+
+# Key for pg_try_advisory_xact_lock so only one instance syncs at a time
+SYNC_LOCK_KEY = 0x6D617473
+SYNC_BATCH_SIZE = 500
+
+# Columns the listing can be sorted by; each has a (column, name) index
+SORT_COLUMNS = {
+    "name": Material.name,
+    "uploaded_at": Material.uploaded_at,
+    "size": Material.size,
+}
+
+# Metrics
+index_writes = registry.counter(
+    "materials_index_writes_total",
+    "Rows written by the materials index sync, by operation (upsert, delete)"
+)
+index_sync_seconds = registry.histogram(
+    "materials_index_sync_seconds",
+    "Time spent syncing the materials table from the catalog"
+)
+
+
+def _chunks(items: Sequence, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class MaterialsIndex:
+    """
+    Postgres index of the materials bucket, kept in sync with the catalog.
+
+    ``sync`` is registered as a catalog listener. Under the advisory lock it
+    diffs every new snapshot against the rows in the table by generation and
+    updated timestamp, and only upserts blobs that changed and deletes blobs
+    that disappeared, so an unchanged bucket costs one narrow read and no
+    writes. Diffing against the table rather than this instance's last sync
+    means a row removed by an instance with an older snapshot is restored by
+    the next sync of a newer one. Listing, filtering and sorting then run
+    as indexed SQL queries via ``query``.
+    """
+
+    def __init__(self, session_factory=async_session):
+        self._session_factory = session_factory
+        self._lock = asyncio.Lock()
+
+    async def sync(self, entries: Tuple[CatalogEntry, ...]) -> None:
+        """Upsert changed blobs and delete removed ones."""
+        # GCS always reports these for listed objects; skip anything partial
+        entries = [
+            entry for entry in entries
+            if entry.generation is not None and entry.size is not None and entry.updated is not None
+        ]
+
+        async with self._lock, self._session_factory() as session:
+            with index_sync_seconds.time():
+                locked = await session.scalar(select(func.pg_try_advisory_xact_lock(SYNC_LOCK_KEY)))
+                if not locked:
+                    # Another instance is syncing the same snapshot
+                    return
+
+                result = await session.execute(
+                    select(Material.name, Material.generation, Material.uploaded_at)
+                )
+                stored = {name: (generation, uploaded_at) for name, generation, uploaded_at in result}
+
+                current = {entry.name for entry in entries}
+                changed = [
+                    entry for entry in entries
+                    if stored.get(entry.name) != (entry.generation, entry.updated)
+                ]
+                removed = [name for name in stored if name not in current]
+
+                for batch in _chunks(changed, SYNC_BATCH_SIZE):
+                    await session.execute(self._upsert_statement(batch))
+                for batch in _chunks(removed, SYNC_BATCH_SIZE):
+                    await session.execute(delete(Material).where(Material.name.in_(batch)))
+                await session.commit()
+
+        index_writes.inc(len(changed), labels={"op": "upsert"})
+        index_writes.inc(len(removed), labels={"op": "delete"})
+
+    @staticmethod
+    def _upsert_statement(entries: Sequence[CatalogEntry]):
+        stmt = insert(Material).values([
+            {
+                "name": entry.name,
+                "content_type": entry.content_type,
+                "size": entry.size,
+                "generation": entry.generation,
+                "uploaded_at": entry.updated,
+            }
+            for entry in entries
+        ])
+        return stmt.on_conflict_do_update(
+            index_elements=[Material.name],
+            set_={
+                "content_type": stmt.excluded.content_type,
+                "size": stmt.excluded.size,
+                "generation": stmt.excluded.generation,
+                "uploaded_at": stmt.excluded.uploaded_at,
+                "synced_at": func.now(),
+            },
+            # Rows synced by another instance in the meantime are left alone
+            where=or_(
+                Material.generation != stmt.excluded.generation,
+                Material.uploaded_at != stmt.excluded.uploaded_at,
+            )
+        )
+
+    async def query(
+        self,
+        db: AsyncSession,
+        limit: int,
+        after: Optional[Tuple[Any, str]] = None,
+        sort: str = "name",
+        descending: bool = False,
+        content_type: Optional[str] = None,
+        uploaded_after: Optional[datetime] = None,
+        uploaded_before: Optional[datetime] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None
+    ) -> Tuple[List[Material], int]:
+        """
+        Return one keyset page of materials and the total matching count.
+
+        Args:
+            db: Database session
+            limit: Maximum number of rows to return
+            after: (sort key, name) of the last row of the previous page
+            sort: One of SORT_COLUMNS
+            descending: Sort in descending order
+            content_type, uploaded_after, uploaded_before, min_size, max_size: Filters
+
+        Returns:
+            Tuple of (rows, total matching rows)
+        """
+        conditions = []
+        if content_type is not None:
+            conditions.append(Material.content_type == content_type)
+        if uploaded_after is not None:
+            conditions.append(Material.uploaded_at >= uploaded_after)
+        if uploaded_before is not None:
+            conditions.append(Material.uploaded_at < uploaded_before)
+        if min_size is not None:
+            conditions.append(Material.size >= min_size)
+        if max_size is not None:
+            conditions.append(Material.size <= max_size)
+
+        total = await db.scalar(select(func.count()).select_from(Material).where(*conditions))
+
+        column = SORT_COLUMNS[sort]
+        stmt = select(Material).where(*conditions)
+        if after is not None:
+            key, name = after
+            if column is Material.name:
+                position = Material.name < name if descending else Material.name > name
+            else:
+                row, bound = tuple_(column, Material.name), tuple_(key, name)
+                position = row < bound if descending else row > bound
+            stmt = stmt.where(position)
+
+        if column is Material.name:
+            order = [Material.name.desc() if descending else Material.name]
+        else:
+            order = [column.desc(), Material.name.desc()] if descending else [column, Material.name]
+        result = await db.execute(stmt.order_by(*order).limit(limit))
+        return list(result.scalars()), total
+
+    @staticmethod
+    def cursor_key(row: Material, sort: str) -> Any:
+        """JSON-safe sort key of a row, for embedding in a cursor."""
+        if sort == "uploaded_at":
+            return row.uploaded_at.isoformat()
+        return getattr(row, sort)
+
+    @staticmethod
+    def parse_cursor_key(value: Any, sort: str) -> Any:
+        """
+        Inverse of cursor_key.
+
+        Raises:
+            ValueError: If the value does not fit the sort column
+        """
+        if sort == "uploaded_at":
+            if not isinstance(value, str):
+                raise ValueError("uploaded_at key must be a timestamp")
+            return datetime.fromisoformat(value)
+        if sort == "size":
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError("size key must be an integer")
+            return value
+        if not isinstance(value, str):
+            raise ValueError("name key must be a string")
+        return value
@@ -0,0 +1,200 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Default histogram buckets (seconds), tuned for request-path latencies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+
+class Counter:
+    """A monotonically increasing counter, optionally split by labels."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge:
+    """
+    A value that can go up and down.
+
+    A gauge may be backed by a callback, in which case it is evaluated
+    every time the registry is rendered.
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str, callback: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.description = description
+        self._callback = callback
+        self._values: Dict[LabelKey, float] = {}
+        self._tracked: Dict[LabelKey, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def track(self, callback: Callable[[], float], labels: Optional[Dict[str, str]] = None) -> None:
+        """Back one labelled series with a callback evaluated at render time."""
+        with self._lock:
+            self._tracked[_label_key(labels)] = callback
+
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        self.inc(-amount, labels)
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        if self._callback is not None:
+            return self._callback()
+        key = _label_key(labels)
+        if key in self._tracked:
+            return self._tracked[key]()
+        return self._values.get(key, 0)
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        if self._callback is not None:
+            return [(self.name, (), self._callback())]
+        with self._lock:
+            samples = [(self.name, key, value) for key, value in self._values.items()]
+            tracked = list(self._tracked.items())
+        return samples + [(self.name, key, callback()) for key, callback in tracked]
+
+
+class Histogram:
+    """A cumulative histogram of observed values, optionally split by labels."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            # Layout: one slot per bucket, then +Inf, then sum
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def time(self, labels: Optional[Dict[str, str]] = None) -> "_Timer":
+        """Return a context manager that observes the elapsed wall time."""
+        return _Timer(self, labels)
+
+    def count(self, labels: Optional[Dict[str, str]] = None) -> float:
+        series = self._series.get(_label_key(labels))
+        return series[-2] if series else 0
+
+    def sum(self, labels: Optional[Dict[str, str]] = None) -> float:
+        series = self._series.get(_label_key(labels))
+        return series[-1] if series else 0.0
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        samples = []
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, value in zip(self.buckets, series):
+                    samples.append((f"{self.name}_bucket", key + (("le", repr(bound)),), value))
+                samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series[-2]))
+                samples.append((f"{self.name}_count", key, series[-2]))
+                samples.append((f"{self.name}_sum", key, series[-1]))
+        return samples
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Optional[Dict[str, str]]):
+        self._histogram = histogram
+        self._labels = labels
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._start, self._labels)
+        return False
+
+
+class Registry:
+    """Process-wide collection of metrics rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {type(metric).__name__}")
+            return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(Counter, name, description)
+
+    def gauge(self, name: str, description: str, callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge, name, description, callback)
+
+    def histogram(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, description, buckets)
+
+    def render(self) -> str:
+        """Render all registered metrics in the Prometheus exposition format."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Default registry used across the application
+registry = Registry()
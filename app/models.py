@@ -1,4 +1,8 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, func
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Boolean, Text, ForeignKey, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -28,3 +32,54 @@ class User(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "last_login": self.last_login.isoformat() if self.last_login else None
         }
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    The authenticated user as seen by the auth dependencies.
+
+    Holds the columns needed to authorize a request and to answer the
+    profile endpoints, never the password hash. ``last_login`` is as of
+    the last cache fill and may trail the write-behind buffer.
+    """
+    id: int
+    email: str
+    is_active: bool
+    is_admin: bool
+    created_at: Optional[datetime] = None
+    last_login: Optional[datetime] = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "email": self.email,
+            "is_active": self.is_active,
+            "is_admin": self.is_admin,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "last_login": self.last_login.isoformat() if self.last_login else None
+        }
+
+
+class Material(Base):
+    """Metadata index of the PDF blobs in the materials bucket, synced by materials_index.py."""
+    __tablename__ = "materials"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True, nullable=False)
+    description = Column(Text, nullable=True)
+    content_type = Column(String, nullable=True, index=True)
+    size = Column(BigInteger, nullable=False)
+    generation = Column(BigInteger, nullable=False)
+    uploaded_at = Column(DateTime(timezone=True), nullable=False)
+    uploaded_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    
+    # Composite indexes back keyset pagination when sorting by date or size
+    __table_args__ = (
+        Index("ix_materials_uploaded_at_name", "uploaded_at", "name"),
+        Index("ix_materials_size_name", "size", "name"),
+    )
+    
+    def __repr__(self):
+        return f"<Material(id={self.id}, name={self.name}, generation={self.generation})>"
@@ -0,0 +1,165 @@
+import hashlib
+import math
+import os
+from typing import List, NamedTuple, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from db import get_redis_client
+from metrics import registry
+
+# Rate limit configuration
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Proxies in front of the app that append to X-Forwarded-For (1 on Cloud Run)
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1"))
+
+# Metrics
+rate_limit_rejections = registry.counter(
+    "rate_limit_rejections_total",
+    "Requests rejected with 429, by route and bucket scope"
+)
+rate_limit_errors = registry.counter(
+    "rate_limit_errors_total",
+    "Rate limit checks skipped because Redis was unavailable"
+)
+
+
+class Limit(NamedTuple):
+    """A token bucket: ``burst`` requests at once, refilled at ``per_minute``."""
+    burst: int
+    per_minute: float
+
+    @classmethod
+    def from_env(cls, name: str, burst: int, per_minute: float) -> "Limit":
+        return cls(
+            burst=int(os.getenv(f"{name}_BURST", str(burst))),
+            per_minute=float(os.getenv(f"{name}_PER_MINUTE", str(per_minute)))
+        )
+
+
+LOGIN_IP_LIMIT = Limit.from_env("RATE_LIMIT_LOGIN_IP", burst=20, per_minute=10)
+LOGIN_ACCOUNT_LIMIT = Limit.from_env("RATE_LIMIT_LOGIN_ACCOUNT", burst=5, per_minute=5)
+SIGNUP_IP_LIMIT = Limit.from_env("RATE_LIMIT_SIGNUP_IP", burst=5, per_minute=2)
+
+# Takes one token from every bucket in KEYS, or from none of them.
+# ARGV holds (burst, tokens per second) for each key. Returns
+# {allowed, retry-after seconds as a string, 1-based index of the first empty bucket}.
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local levels = {}
+local retry_after = 0
+local denied = 0
+for i, key in ipairs(KEYS) do
+    local burst = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        local wait = (1 - tokens) / rate
+        if wait > retry_after then
+            retry_after = wait
+        end
+        if denied == 0 then
+            denied = i
+        end
+    end
+end
+for i, key in ipairs(KEYS) do
+    local burst = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local tokens = levels[i]
+    if denied == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000))
+end
+return {denied == 0 and 1 or 0, tostring(retry_after), denied}
+"""
+
+
+def client_ip(request: Request) -> str:
+    """
+    Address of the client, as seen by the outermost trusted proxy.
+
+    Each trusted proxy appends the address it received the request from to
+    X-Forwarded-For, so the entry ``RATE_LIMIT_TRUSTED_PROXIES`` from the end
+    is the first one a client cannot forge.
+    """
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded and RATE_LIMIT_TRUSTED_PROXIES > 0:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(RATE_LIMIT_TRUSTED_PROXIES, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+def account_key(email: str) -> str:
+    """Bucket id for an account that keeps addresses out of Redis key names."""
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+
+
+class RateLimiter:
+    """
+    Distributed token-bucket rate limiting on Redis.
+
+    Buckets live in Redis hashes and are updated by a single Lua script, so
+    concurrent requests on any number of instances see one consistent
+    bucket; the script takes a token from all buckets of a request or from
+    none. When Redis is unavailable requests are let through (fail-open).
+    """
+
+    def __init__(self, enabled: bool = RATE_LIMIT_ENABLED):
+        self.enabled = enabled
+        self._script = None
+
+    async def hit(self, route: str, buckets: List[Tuple[str, str, Limit]]) -> None:
+        """
+        Take one token from each bucket, or reject the request.
+
+        Args:
+            route: Route name used in keys and metrics (e.g. "login")
+            buckets: (scope, identifier, limit) per bucket, e.g. ("ip", "1.2.3.4", LOGIN_IP_LIMIT)
+
+        Raises:
+            HTTPException: 429 with Retry-After if any bucket is empty
+        """
+        if not self.enabled or not buckets:
+            return
+
+        keys = [f"ratelimit:{route}:{scope}:{identifier}" for scope, identifier, _ in buckets]
+        args = []
+        for _, _, limit in buckets:
+            args.extend([limit.burst, limit.per_minute / 60])
+        try:
+            allowed, retry_after, denied = await self._get_script()(keys=keys, args=args)
+        except Exception as e:
+            rate_limit_errors.inc()
+            print(f"Rate limit: check skipped, Redis unavailable: {e}")
+            return
+
+        if not int(allowed):
+            scope = buckets[int(denied) - 1][0]
+            rate_limit_rejections.inc(labels={"route": route, "scope": scope})
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please try again later",
+                headers={"Retry-After": str(max(1, math.ceil(float(retry_after))))},
+            )
+
+    async def close(self) -> None:
+        # The client belongs to the shared pool; only forget the script handle
+        self._script = None
+
+    def _get_script(self):
+        if self._script is None:
+            self._script = get_redis_client().register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+
+# Process-wide limiter used by the auth routes
+rate_limiter = RateLimiter()
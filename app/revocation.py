@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import math
+import os
+import time
+from typing import Optional
+
+import redis.asyncio as redis
+
+from db import get_redis_client, pipelined
+from metrics import registry
+
+# Revocation configuration
+REVOCATION_FILTER_CAPACITY = int(os.getenv("REVOCATION_FILTER_CAPACITY", "100000"))
+REVOCATION_FILTER_ERROR_RATE = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", "3600"))
+REVOCATION_CHANNEL = "token:revoked"
+REVOCATION_KEY_PREFIX = "revoked:"
+
+# Metrics
+revocation_checks = registry.counter(
+    "token_revocation_checks_total",
+    "Token revocation checks by result (filter_miss, revoked, false_positive, error)"
+)
+revocations = registry.counter(
+    "token_revocations_total",
+    "Tokens revoked through this instance"
+)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    Sized for ``capacity`` items at the given false-positive rate; the bit
+    positions come from one BLAKE2b digest split into two halves
+    (Kirsch-Mitzenmacher double hashing).
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenRevocations:
+    """
+    Denylist of revoked token IDs (``jti`` claims).
+
+    The source of truth is one Redis key per revoked token, expiring together
+    with the token. Every instance mirrors the IDs into a local Bloom filter,
+    seeded with SCAN on start and kept current through pub/sub, so checking a
+    token that was never revoked (nearly every request) needs no network hop.
+    Only a filter hit is confirmed in Redis. The filter is rebuilt
+    periodically so IDs of expired tokens drop out of it.
+
+    A filter hit that cannot be confirmed because Redis is unavailable is
+    treated as revoked.
+    """
+
+    def __init__(
+        self,
+        capacity: int = REVOCATION_FILTER_CAPACITY,
+        error_rate: float = REVOCATION_FILTER_ERROR_RATE,
+        rebuild_interval: float = REVOCATION_REBUILD_SECONDS
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self._filter = BloomFilter(capacity, error_rate)
+        self._rebuilding: Optional[BloomFilter] = None
+        # Client override for tests; the shared pool client otherwise
+        self._redis: Optional[redis.Redis] = None
+        self._listener_task: Optional[asyncio.Task] = None
+
+        registry.gauge(
+            "token_revocation_filter_entries",
+            "Revoked token IDs in the local Bloom filter",
+            lambda: self._filter.count
+        )
+
+    @staticmethod
+    def redis_key(jti: str) -> str:
+        return f"{REVOCATION_KEY_PREFIX}{jti}"
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        """
+        Revoke a token until it expires.
+
+        Args:
+            jti: The token's ``jti`` claim
+            expires_at: The token's ``exp`` claim (UNIX timestamp)
+        """
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return
+        self._add(jti)
+        await pipelined([
+            ("SET", self.redis_key(jti), 1, "EX", ttl),
+            ("PUBLISH", REVOCATION_CHANNEL, jti)
+        ], client=self._get_redis())
+        revocations.inc()
+
+    async def is_revoked(self, jti: str) -> bool:
+        """Check a token ID, answering from memory unless the filter matches."""
+        if jti not in self._filter:
+            revocation_checks.inc(labels={"result": "filter_miss"})
+            return False
+        try:
+            revoked = bool(await self._get_redis().exists(self.redis_key(jti)))
+        except Exception as e:
+            print(f"Revocations: could not confirm filter hit in Redis: {e}")
+            revocation_checks.inc(labels={"result": "error"})
+            return True
+        revocation_checks.inc(labels={"result": "revoked" if revoked else "false_positive"})
+        return revoked
+
+    async def start(self) -> None:
+        """Seed the filter from Redis and follow revocations from other instances."""
+        if self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop the listener."""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener_task = None
+
+    async def rebuild(self) -> None:
+        """Replace the filter with one built from the revocations still in Redis."""
+        self._rebuilding = BloomFilter(self.capacity, self.error_rate)
+        try:
+            async for key in self._get_redis().scan_iter(match=f"{REVOCATION_KEY_PREFIX}*", count=1000):
+                self._rebuilding.add(key[len(REVOCATION_KEY_PREFIX):])
+            self._filter = self._rebuilding
+        finally:
+            self._rebuilding = None
+
+    def _add(self, jti: str) -> None:
+        self._filter.add(jti)
+        # IDs published while a rebuild is scanning may be missed by SCAN
+        if self._rebuilding is not None:
+            self._rebuilding.add(jti)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._get_redis().pubsub() as pubsub:
+                    # Subscribe before scanning so no revocation falls in between
+                    await pubsub.subscribe(REVOCATION_CHANNEL)
+                    await self.rebuild()
+                    rebuilt_at = time.monotonic()
+                    while True:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message is not None and message["type"] == "message":
+                            self._add(message["data"])
+                        if time.monotonic() - rebuilt_at > self.rebuild_interval:
+                            await self.rebuild()
+                            rebuilt_at = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Revocations: listener failed, retrying: {e}")
+            await asyncio.sleep(5)
+
+    def _get_redis(self) -> redis.Redis:
+        return self._redis if self._redis is not None else get_redis_client()
+
+
+# Process-wide denylist used by the auth dependencies
+token_revocations = TokenRevocations()
@@ -0,0 +1,432 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Security, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import Integer, String, any_, bindparam, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import get_db, mark_user_written, read_session_factory
+from models import Principal, User
+from schemas import (
+    BulkUserResult,
+    BulkUserTargets,
+    HTTPError,
+    UserDirectory,
+    UserImportResponse,
+    UserResponse
+)
+from user_cache import user_cache
+from user_import import IMPORT_MAX_ROWS, import_users, iter_lines
+from utils import get_current_user, get_read_db, encode_cursor, decode_cursor
+
+# Admin user directory configuration
+ADMIN_USERS_PAGE_SIZE = int(os.getenv("ADMIN_USERS_PAGE_SIZE", "100"))
+ADMIN_USERS_MAX_PAGE_SIZE = int(os.getenv("ADMIN_USERS_MAX_PAGE_SIZE", "1000"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+EXPORT_COLUMNS = [User.id, User.email, User.is_active, User.is_admin, User.created_at, User.last_login]
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(get_current_user)]
+)
+
+
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class BulkAction(str, Enum):
+    ACTIVATE = "activate"
+    DEACTIVATE = "deactivate"
+    PROMOTE = "promote"
+    DEMOTE = "demote"
+
+
+# Column and value each bulk action sets
+BULK_ACTIONS = {
+    BulkAction.ACTIVATE: (User.is_active, True),
+    BulkAction.DEACTIVATE: (User.is_active, False),
+    BulkAction.PROMOTE: (User.is_admin, True),
+    BulkAction.DEMOTE: (User.is_admin, False),
+}
+
+
+class ExportFormat(str, Enum):
+    JSON = "json"
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+def user_filters(
+    is_active: Optional[bool] = None,
+    is_admin: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    last_login_after: Optional[datetime] = None,
+    last_login_before: Optional[datetime] = None
+) -> List:
+    """WHERE clauses for the admin user filters; None means no constraint."""
+    clauses = []
+    if is_active is not None:
+        clauses.append(User.is_active == is_active)
+    if is_admin is not None:
+        clauses.append(User.is_admin == is_admin)
+    if created_after is not None:
+        clauses.append(User.created_at >= created_after)
+    if created_before is not None:
+        clauses.append(User.created_at < created_before)
+    if last_login_after is not None:
+        clauses.append(User.last_login >= last_login_after)
+    if last_login_before is not None:
+        clauses.append(User.last_login < last_login_before)
+    return clauses
+
+
+def target_clauses(targets: BulkUserTargets) -> List:
+    """
+    WHERE clauses selecting the targets of a bulk operation.
+
+    Id and email lists are bound as a single Postgres array parameter
+    (``= ANY(...)``), so very long lists stay one statement with one
+    parameter each.
+
+    Raises:
+        HTTPException: If no target criteria were given
+    """
+    clauses = []
+    if targets.ids is not None:
+        clauses.append(User.id == any_(bindparam("target_ids", targets.ids, type_=ARRAY(Integer))))
+    if targets.emails is not None:
+        clauses.append(User.email == any_(bindparam("target_emails", list(targets.emails), type_=ARRAY(String))))
+    if targets.filter is not None:
+        clauses.extend(user_filters(**targets.filter.dict()))
+    if not clauses:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give ids, emails or a non-empty filter"
+        )
+    return clauses
+
+
+def bulk_update_statement(action: BulkAction, clauses: List, acting_user_id: int):
+    """
+    One ``UPDATE users ... RETURNING id`` for a bulk action.
+
+    Rows that already have the target value are left alone, so the returned
+    ids are exactly the users that changed. Admins cannot deactivate or
+    demote themselves.
+    """
+    column, value = BULK_ACTIONS[action]
+    if value is False:
+        clauses = [*clauses, User.id != acting_user_id]
+    return (
+        update(User)
+        .where(*clauses, column != value)
+        .values({column.key: value})
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _apply_bulk_action(
+    db: AsyncSession,
+    action: BulkAction,
+    clauses: List,
+    acting_user_id: int
+) -> BulkUserResult:
+    try:
+        result = await db.execute(bulk_update_statement(action, clauses, acting_user_id))
+        user_ids = result.scalars().all()
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    # Changes to is_active / is_admin must be visible to the auth dependencies at once
+    await user_cache.invalidate(*user_ids)
+    # The acting admin's own directory reads stay on the primary for a while
+    mark_user_written(acting_user_id)
+    return BulkUserResult(action=action.value, affected=len(user_ids))
+
+
+async def _read_target_file(request: Request) -> BulkUserTargets:
+    """
+    Collect the targets of a bulk action from a streamed file.
+
+    The file holds one user id or one email per line (the first column of a
+    CSV file); a header line naming the column is skipped.
+    """
+    ids, emails = [], []
+    async for line in iter_lines(request.stream()):
+        value = next(csv.reader([line]), [""])[0].strip() if line.strip() else ""
+        if not value or value.lower() in ("id", "email"):
+            continue
+        if value.isdigit():
+            ids.append(int(value))
+        elif "@" in value:
+            emails.append(value)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not a user id or email: {value[:100]}"
+            )
+        if len(ids) + len(emails) > IMPORT_MAX_ROWS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Target files are limited to {IMPORT_MAX_ROWS} rows"
+            )
+    if ids and emails:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A target file must list either ids or emails, not both"
+        )
+    if not ids and not emails:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The target file is empty"
+        )
+    try:
+        return BulkUserTargets(ids=ids or None, emails=emails or None)
+    except ValidationError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The target file contains an invalid email"
+        )
+
+
+def _cursor_id(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    position = decode_cursor(cursor)
+    if not isinstance(position.get("id"), int):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return position["id"]
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def _export_users(clauses: List, after_id: int, fmt: ExportFormat, session_factory) -> AsyncIterator[str]:
+    """
+    Stream matching users as CSV or NDJSON chunks.
+
+    Rows come from a server-side cursor in partitions of EXPORT_CHUNK_ROWS,
+    so memory use does not depend on the number of users. The export uses
+    its own session from ``session_factory`` because it outlives the
+    request handler.
+    """
+    names = [column.key for column in EXPORT_COLUMNS]
+    statement = (
+        select(*EXPORT_COLUMNS)
+        .where(User.id > after_id, *clauses)
+        .order_by(User.id)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    async with session_factory() as session:
+        result = await session.stream(statement)
+        if fmt == ExportFormat.CSV:
+            yield ",".join(names) + "\r\n"
+        async for partition in result.partitions():
+            buffer = io.StringIO()
+            if fmt == ExportFormat.CSV:
+                writer = csv.writer(buffer)
+                writer.writerows([_export_value(value) for value in row] for row in partition)
+            else:
+                for row in partition:
+                    buffer.write(json.dumps(dict(zip(names, map(_export_value, row)))))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+
+
+def _import_format(request: Request, format: Optional[ImportFormat]) -> ImportFormat:
+    if format is not None:
+        return format
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "text/csv":
+        return ImportFormat.CSV
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return ImportFormat.NDJSON
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Send text/csv or application/x-ndjson, or pass ?format="
+    )
+
+
+@router.post(
+    "/users/import",
+    response_model=UserImportResponse,
+    responses={
+        403: {"model": HTTPError, "description": "Not enough permissions"},
+        413: {"model": HTTPError, "description": "Too many rows"},
+        415: {"model": HTTPError, "description": "Unsupported file format"}
+    }
+)
+async def import_users_endpoint(
+    request: Request,
+    format: Optional[ImportFormat] = Query(None, description="Body format; defaults to the Content-Type"),
+    update_existing: bool = Query(False, description="Overwrite password and flags of existing users"),
+    current_user: Principal = Security(get_current_user, scopes=["manage:users"]),
+    db: AsyncSession = Depends(get_db)
+) -> UserImportResponse:
+    """
+    Create users in bulk from a CSV or NDJSON request body.
+    
+    Each record has an `email`, either a `password` or a bcrypt `hashed_password`,
+    and optional `is_active` / `is_admin` flags; CSV files start with a header
+    line and hold one record per line. The body is streamed, e.g.
+    `curl --data-binary @cohort.csv -H "Content-Type: text/csv"`.
+    
+    Returns one result per record. Invalid records are reported and skipped;
+    valid records are imported in a single transaction.
+    """
+    fmt = _import_format(request, format)
+    try:
+        results = await import_users(db, request.stream(), fmt.value, update_existing)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    updated_ids = [result["id"] for result in results if result["status"] == "updated"]
+    await user_cache.invalidate(*updated_ids)
+    mark_user_written(current_user.id)
+
+    counts = {name: 0 for name in ("created", "updated", "skipped", "invalid")}
+    for result in results:
+        counts[result["status"]] += 1
+    return UserImportResponse(**counts, results=results)
+
+
+@router.get(
+    "/users",
+    response_model=UserDirectory,
+    responses={
+        400: {"model": HTTPError, "description": "Invalid cursor"},
+        403: {"model": HTTPError, "description": "Not enough permissions"}
+    }
+)
+async def list_users(
+    limit: int = Query(ADMIN_USERS_PAGE_SIZE, ge=1, le=ADMIN_USERS_MAX_PAGE_SIZE, description="Users per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's `next_cursor`"),
+    is_active: Optional[bool] = Query(None),
+    is_admin: Optional[bool] = Query(None),
+    created_after: Optional[datetime] = Query(None, description="Only users created at or after this time"),
+    created_before: Optional[datetime] = Query(None, description="Only users created before this time"),
+    last_login_after: Optional[datetime] = Query(None, description="Only users who last logged in at or after this time"),
+    last_login_before: Optional[datetime] = Query(None, description="Only users who last logged in before this time"),
+    format: ExportFormat = Query(ExportFormat.JSON, description="csv or ndjson stream every matching user instead of one page"),
+    current_user: Principal = Security(get_current_user, scopes=["read:all_profiles"]),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    List users ordered by id, one keyset page at a time.
+    
+    With `format=csv` or `format=ndjson` all matching users (starting after
+    `cursor`, if given) are streamed as a download instead; `limit` is ignored.
+    Reads go to the read replica when one is configured.
+    """
+    after_id = _cursor_id(cursor)
+    clauses = user_filters(
+        is_active=is_active,
+        is_admin=is_admin,
+        created_after=created_after,
+        created_before=created_before,
+        last_login_after=last_login_after,
+        last_login_before=last_login_before
+    )
+
+    if format != ExportFormat.JSON:
+        media_type = "text/csv" if format == ExportFormat.CSV else "application/x-ndjson"
+        return StreamingResponse(
+            _export_users(clauses, after_id, format, read_session_factory(current_user.id)),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="users.{format.value}"'}
+        )
+
+    result = await db.execute(
+        select(User)
+        .where(User.id > after_id, *clauses)
+        .order_by(User.id)
+        .limit(limit + 1)
+    )
+    users = result.scalars().all()
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor({"id": users[-1].id})
+
+    return UserDirectory(
+        users=[
+            UserResponse(
+                id=user.id,
+                email=user.email,
+                is_active=user.is_active,
+                is_admin=user.is_admin,
+                created_at=user.created_at,
+                last_login=user.last_login
+            )
+            for user in users
+        ],
+        next_cursor=next_cursor
+    )
+
+
+@router.post(
+    "/users/bulk/{action}",
+    response_model=BulkUserResult,
+    responses={
+        400: {"model": HTTPError, "description": "No targets given"},
+        403: {"model": HTTPError, "description": "Not enough permissions"}
+    }
+)
+async def bulk_update_users(
+    action: BulkAction,
+    targets: BulkUserTargets,
+    current_user: Principal = Security(get_current_user, scopes=["manage:users"]),
+    db: AsyncSession = Depends(get_db)
+) -> BulkUserResult:
+    """
+    Activate, deactivate, promote or demote many users in one statement.
+    
+    Targets are given as `ids`, `emails` and/or a `filter` (the criteria of
+    `GET /admin/users`); users must match all of them. Returns the number of
+    users whose row changed.
+    """
+    return await _apply_bulk_action(db, action, target_clauses(targets), current_user.id)
+
+
+@router.post(
+    "/users/bulk/{action}/file",
+    response_model=BulkUserResult,
+    responses={
+        400: {"model": HTTPError, "description": "Malformed or empty target file"},
+        403: {"model": HTTPError, "description": "Not enough permissions"},
+        413: {"model": HTTPError, "description": "Too many rows"}
+    }
+)
+async def bulk_update_users_from_file(
+    action: BulkAction,
+    request: Request,
+    current_user: Principal = Security(get_current_user, scopes=["manage:users"]),
+    db: AsyncSession = Depends(get_db)
+) -> BulkUserResult:
+    """
+    Like `POST /admin/users/bulk/{action}`, with the targets streamed as a
+    file of user ids or emails, one per line.
+    """
+    targets = await _read_target_file(request)
+    return await _apply_bulk_action(db, action, target_clauses(targets), current_user.id)
@@ -9,8 +9,19 @@ from typing import Optional, Dict, Any, List
 from jose import jwt, JWTError
 from pydantic import ValidationError
 
-from db import get_db, async_session
-from models import User
+from db import get_db, async_session, release_connection
+from hashing import password_hasher
+from login_buffer import last_login_buffer
+from rate_limit import (
+    rate_limiter,
+    client_ip,
+    account_key,
+    LOGIN_IP_LIMIT,
+    LOGIN_ACCOUNT_LIMIT,
+    SIGNUP_IP_LIMIT
+)
+from revocation import token_revocations
+from models import Principal, User
 from schemas import (
     UserCreate, 
     UserResponse, 
@@ -21,9 +32,8 @@ from schemas import (
     StandardResponse
 )
 from utils import (
-    verify_password, 
-    get_password_hash, 
     create_access_token, 
+    decode_token, 
     create_refresh_token,
     SECRET_KEY,
     ALGORITHM,
@@ -44,11 +54,13 @@ router = APIRouter(prefix="/auth", tags=["auth"])
     response_model=UserResponse,
     responses={
         400: {"model": HTTPError, "description": "Bad Request - Invalid input or email already registered"},
+        429: {"model": HTTPError, "description": "Too Many Requests - Retry after the indicated delay"},
         500: {"model": HTTPError, "description": "Internal Server Error"}
     }
 )
 async def signup(
     user_data: UserCreate, 
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ) -> UserResponse:
     """
@@ -60,6 +72,9 @@ async def signup(
     
     Returns the created user's information without sensitive data.
     """
+    # Throttle before any database or hashing work
+    await rate_limiter.hit("signup", [("ip", client_ip(request), SIGNUP_IP_LIMIT)])
+    
     # Check if user already exists
     result = await db.execute(select(User).where(User.email == user_data.email))
     if result.scalars().first():
@@ -67,6 +82,8 @@ async def signup(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
+    # Give the connection back while bcrypt runs; the insert checks out another
+    await release_connection(db)
     
     # Validate password strength
     if not validate_password_strength(user_data.password):
@@ -75,9 +92,11 @@ async def signup(
             detail="Password must be at least 8 characters long and contain a number, uppercase letter, and special character"
         )
     
+    # Hash outside the try block so a saturated hashing pool surfaces as 503
+    hashed_password = await password_hasher.hash(user_data.password)
+
     try:
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
         new_user = User(
             email=user_data.email, 
             hashed_password=hashed_password,
@@ -115,10 +134,12 @@ async def signup(
     responses={
         400: {"model": HTTPError, "description": "Bad Request - Invalid input or inactive user"},
         401: {"model": HTTPError, "description": "Unauthorized - Incorrect credentials"},
+        429: {"model": HTTPError, "description": "Too Many Requests - Retry after the indicated delay"},
         500: {"model": HTTPError, "description": "Internal Server Error"}
     }
 )
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db)
 ) -> JSONResponse:
@@ -130,12 +151,23 @@ async def login(
     
     Returns access and refresh tokens in HTTP-only cookies and a JSON response.
     """
+    # Throttle per client and per account before spending a bcrypt verify
+    await rate_limiter.hit("login", [
+        ("ip", client_ip(request), LOGIN_IP_LIMIT),
+        ("account", account_key(form_data.username), LOGIN_ACCOUNT_LIMIT)
+    ])
+    
     # Find user by email
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalars().first()
+    # Nothing else touches the database; release it before bcrypt and signing
+    await release_connection(db)
     
     # Check if user exists and password is correct
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -150,10 +182,10 @@ async def login(
         )
     
     try:
-        # Update last login time
-        user.last_login = datetime.now(timezone.utc)
-        db.add(user)
-        await db.commit()
+        # Queue the last login time (and a hash made with another bcrypt
+        # cost, applied only if the password is unchanged by then) for the
+        # next batched write instead of writing it now
+        last_login_buffer.record(user.id, datetime.now(timezone.utc), new_hash, user.hashed_password)
         
         # Determine user role(s)
         user_roles = ["user"]
@@ -209,7 +241,6 @@ async def login(
         return response
         
     except Exception as e:
-        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred during login"
@@ -263,9 +294,19 @@ async def refresh_token(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        # Reject refresh tokens revoked at logout
+        jti = payload.get("jti")
+        if jti and await token_revocations.is_revoked(jti):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
         # Get user from database
         result = await db.execute(select(User).where(User.id == user_id, User.email == user_email))
         user = result.scalars().first()
+        await release_connection(db)
         
         if user is None or not user.is_active:
             raise HTTPException(
@@ -333,6 +374,8 @@ async def refresh_token(
             detail="Invalid refresh token",
             headers={"WWW-Authenticate": "Bearer"},
         ) from e
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -348,12 +391,32 @@ async def refresh_token(
         500: {"model": HTTPError, "description": "Internal Server Error"}
     }
 )
-async def logout() -> JSONResponse:
+async def logout(request: Request) -> JSONResponse:
     """
-    Log out the current user by clearing authentication cookies.
+    Log out the current user by revoking their tokens and clearing authentication cookies.
     
-    Clears both access and refresh token cookies.
+    The access token (Authorization header or cookie) and the refresh token
+    cookie are revoked until they expire. Clears both access and refresh token cookies.
     """
+    tokens = [
+        request.headers.get("Authorization"),
+        request.cookies.get("access_token"),
+        request.cookies.get("refresh_token")
+    ]
+    for token in filter(None, tokens):
+        if token.startswith("Bearer "):
+            token = token.split(" ")[1]
+        try:
+            payload = decode_token(token)
+        except JWTError:
+            # Invalid or expired tokens need no revocation
+            continue
+        if payload.get("jti"):
+            try:
+                await token_revocations.revoke(payload["jti"], payload["exp"])
+            except Exception as e:
+                print(f"Logout: could not revoke token {payload['jti']}: {e}")
+    
     try:
         # Create response
         response = JSONResponse(
@@ -393,8 +456,7 @@ async def logout() -> JSONResponse:
     }
 )
 async def get_current_user_profile(
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> UserResponse:
     """
     Get the current authenticated user's profile information.
@@ -402,28 +464,12 @@ async def get_current_user_profile(
     Returns the user's details including email, account status, and role.
     Requires a valid access token.
     """
-    try:
-        # Refresh user data from database to ensure it's current
-        result = await db.execute(select(User).where(User.id == current_user.id))
-        user = result.scalars().first()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-            
-        return UserResponse(
-            id=user.id,
-            email=user.email,
-            is_active=user.is_active,
-            is_admin=user.is_admin,
-            created_at=user.created_at,
-            last_login=user.last_login
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while fetching user profile"
-        ) from e
+    # The dependency chain already resolved the principal for this request
+    return UserResponse(
+        id=current_user.id,
+        email=current_user.email,
+        is_active=current_user.is_active,
+        is_admin=current_user.is_admin,
+        created_at=current_user.created_at,
+        last_login=current_user.last_login
+    )
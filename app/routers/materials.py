@@ -1,32 +1,127 @@
 import os
+import asyncio
+import hashlib
 from datetime import datetime
-from typing import List
+from typing import Any, List, Optional, Tuple
 from dataclasses import dataclass
+from enum import Enum
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from schemas import Material, MaterialList
-from models import User
-from db import get_db
-from utils import get_current_user, generate_presigned_url
+from models import Principal, Material as MaterialRecord
+from db import release_connection
+from utils import get_current_user, get_read_db, encode_cursor, decode_cursor, etag_matches
+from catalog import MaterialsCatalog
+from signing import UrlSigner
+from storage import AsyncStorage
+from materials_index import MaterialsIndex
+from search_index import SearchIndex, SEARCH_INDEX_ENABLED
+from blob_cache import BlobCache
+from downloads import (
+    MATERIALS_PROXY_ENABLED,
+    CachedFileResponse,
+    parse_range,
+    schedule_cache_fill,
+    stream_from_storage
+)
 
 # Get GCS bucket name from env
 MATERIALS_BUCKET = os.getenv("MATERIALS_BUCKET")
 if not MATERIALS_BUCKET:
     raise RuntimeError("MATERIALS_BUCKET environment variable not set.")
 
+# Pagination limits for the materials listing
+MATERIALS_PAGE_SIZE = int(os.getenv("MATERIALS_PAGE_SIZE", "50"))
+MATERIALS_MAX_PAGE_SIZE = int(os.getenv("MATERIALS_MAX_PAGE_SIZE", "200"))
+
 # Attempt to initialize Google Cloud Storage client
 storage_client = None
 try:
-    from google.cloud import storage
-    storage_client = storage.Client()
+    from google.cloud import storage as gcs
+    storage_client = gcs.Client()
     print(f"Successfully initialized GCS client for bucket: {MATERIALS_BUCKET}")
 except Exception as e:
     print(f"Critical: GCS client failed to initialize: {e}. Material listing will not work.")
     # Depending on desired behavior, you might raise an error here to prevent app startup
     # or allow it to run but endpoints will fail.
 
+# All blocking GCS calls go through a bounded thread pool with timeouts
+storage = AsyncStorage(storage_client, MATERIALS_BUCKET)
+
+# In-memory snapshot of the bucket, refreshed in the background (see main.py startup)
+catalog = MaterialsCatalog(storage)
+
+# Postgres metadata index, synced incrementally from every new catalog snapshot
+materials_index = MaterialsIndex()
+catalog.add_listener(materials_index.sync)
+
+# Full-text index over the PDFs, updated as blob generations change
+search_index = SearchIndex(storage)
+if SEARCH_INDEX_ENABLED:
+    catalog.add_listener(search_index.sync)
+
+# Local LRU disk cache of hot PDFs for the optional download proxy
+blob_cache = BlobCache()
+
+# Batch signer that reuses still-valid signed URLs across requests and users
+signer = UrlSigner(storage)
+
+class MaterialSort(str, Enum):
+    NAME = "name"
+    UPLOADED_AT = "uploaded_at"
+    SIZE = "size"
+
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+def _listing_etag(user_id: int, items: list, signed_urls: dict, total: int, offset: int, next_position) -> str:
+    """
+    Strong ETag for a listing page.
+    
+    Covers every blob generation on the page and the signing time of its URL,
+    so the tag changes when a blob is replaced or its URL is re-signed.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((user_id, total, offset, next_position)).encode())
+    for name, item in items:
+        synced_at = item.synced_at.isoformat() if isinstance(item, MaterialRecord) else None
+        digest.update(repr((name, item.generation, synced_at, signed_urls[name].signed_at)).encode())
+    return f'"{digest.hexdigest()}"'
+
+def _cursor_position(cursor: Optional[str], sort: str, use_index: bool) -> Tuple[Optional[str], Any, int]:
+    """
+    Validate a listing cursor.
+
+    Returns:
+        Tuple of (name of the last row seen, its sort key for index listings, offset)
+
+    Raises:
+        HTTPException: If the cursor is malformed or does not fit the sort
+    """
+    position = decode_cursor(cursor) if cursor else {}
+    after = position.get("after")
+    offset = position.get("offset", 0)
+    valid = (
+        (after is None or isinstance(after, str))
+        and isinstance(offset, int) and not isinstance(offset, bool) and offset >= 0
+    )
+    key = None
+    if valid and use_index and after is not None:
+        try:
+            key = MaterialsIndex.parse_cursor_key(position.get("key", after), sort)
+        except (TypeError, ValueError):
+            valid = False
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return after, key, offset
+
 router = APIRouter(
     prefix="/materials",
     tags=["materials"],
@@ -35,10 +130,31 @@ router = APIRouter(
 
 
 @router.get("", response_model=MaterialList)
-async def list_materials(current_user: User = Depends(get_current_user)):
+async def list_materials(
+    request: Request,
+    response: Response,
+    limit: int = Query(MATERIALS_PAGE_SIZE, ge=1, le=MATERIALS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Cursor returned as `next_cursor` by the previous page"),
+    content_type: Optional[str] = Query(None, description="Only materials with this content type"),
+    uploaded_after: Optional[datetime] = Query(None, description="Only materials uploaded at or after this time"),
+    uploaded_before: Optional[datetime] = Query(None, description="Only materials uploaded before this time"),
+    min_size: Optional[int] = Query(None, ge=0, description="Minimum size in bytes"),
+    max_size: Optional[int] = Query(None, ge=0, description="Maximum size in bytes"),
+    sort: MaterialSort = Query(MaterialSort.NAME),
+    order: SortOrder = Query(SortOrder.ASC),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
     """
-    List all available PDF materials with presigned URLs.
-    Uses mock data in development mode.
+    List available PDF materials with presigned URLs, one page at a time.
+    
+    Unfiltered listings by name are served from the in-memory catalog;
+    filtered or sorted listings run as indexed queries on the materials
+    table. Only the returned page is signed, so response size and signing
+    work do not grow with the bucket.
+    
+    Responses carry a strong ETag; a matching If-None-Match is answered with
+    304 Not Modified before the page is serialized.
     """
     if not storage_client:
         raise HTTPException(
@@ -46,43 +162,234 @@ async def list_materials(current_user: User = Depends(get_current_user)):
             detail="GCS client is not available. Cannot retrieve materials."
         )
 
+    filters = dict(
+        content_type=content_type,
+        uploaded_after=uploaded_after,
+        uploaded_before=uploaded_before,
+        min_size=min_size,
+        max_size=max_size
+    )
+    use_index = sort != MaterialSort.NAME or order != SortOrder.ASC or any(
+        value is not None for value in filters.values()
+    )
+    after_name, after_key, offset = _cursor_position(cursor, sort.value, use_index)
+
     try:
-        # Get bucket
-        bucket = storage_client.bucket(MATERIALS_BUCKET)
+        if use_index:
+            after = (after_key, after_name) if after_name is not None else None
+
+            # Filter, sort and paginate in Postgres
+            rows, total = await materials_index.query(
+                db,
+                limit,
+                after=after,
+                sort=sort.value,
+                descending=order == SortOrder.DESC,
+                **filters
+            )
+            items = [(row.name, row) for row in rows]
+            next_position = (
+                {"after": rows[-1].name, "key": MaterialsIndex.cursor_key(rows[-1], sort.value), "offset": offset + len(rows)}
+                if rows and offset + len(rows) < total else None
+            )
+        else:
+            # Read one page of PDF blobs from the in-memory catalog snapshot
+            entries, offset, total = await catalog.get_page(limit, after=after_name)
+            items = [(entry.name, entry) for entry in entries]
+            next_position = (
+                {"after": entries[-1].name}
+                if offset + len(entries) < total else None
+            )
         
-        # List blobs in the bucket
-        blobs = bucket.list_blobs()
+        # Signing may call out to IAM; don't hold a connection through it
+        await release_connection(db)
+
+        # Sign the page in one batch; still-valid signatures are reused
+        signed_urls = await signer.sign_many(name for name, _ in items)
+        
+        # Answer conditional requests before building the response body
+        etag = _listing_etag(current_user.id, items, signed_urls, total, offset, next_position)
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+        response.headers.update(cache_headers)
         
         # Create list of materials with URLs
         materials = []
-        pdf_blobs = [blob for blob in blobs if blob.name.lower().endswith('.pdf')]
-        
-        for blob in pdf_blobs:
-            # Generate presigned URL
-            url = generate_presigned_url(storage_client, MATERIALS_BUCKET, blob.name)
-            
-            # Add to materials list
-            materials.append(
-                Material(
-                    name=blob.name,
-                    url=url,
-                    size=blob.size,
-                    uploaded_at=blob.updated,
+        for name, item in items:
+            if isinstance(item, MaterialRecord):
+                material = Material(
+                    id=item.id,
+                    name=item.name,
+                    description=item.description,
+                    url=signed_urls[name].url,
+                    size=item.size,
+                    content_type=item.content_type,
+                    uploaded_at=item.uploaded_at,
+                    uploaded_by=item.uploaded_by
+                )
+            else:
+                material = Material(
+                    name=item.name,
+                    url=signed_urls[name].url,
+                    size=item.size,
+                    content_type=item.content_type,
+                    uploaded_at=item.updated,
                     uploaded_by=current_user.id
                 )
-            )
+            materials.append(material)
         
-        # Return MaterialList with required pagination fields
+        # Return MaterialList with pagination fields
         return MaterialList(
             materials=materials,
-            total=len(materials),
-            page=1,  # Default to page 1 since we're not implementing pagination yet
-            pages=1   # Only 1 page since we're not implementing pagination yet
+            total=total,
+            page=offset // limit + 1,
+            pages=max(1, -(-total // limit)),
+            next_cursor=encode_cursor(next_position) if next_position else None
         )
     
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Timed out waiting for Cloud Storage"
+        )
     except Exception as e:
         print(f"Error retrieving materials: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving materials: {str(e)}"
         )
+
+
+@router.get("/search", response_model=MaterialList)
+async def search_materials(
+    q: str = Query(..., min_length=1, max_length=200, description="Words that must all appear in the material"),
+    limit: int = Query(20, ge=1, le=MATERIALS_MAX_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Full-text search over the text of the PDF materials.
+    
+    Returns the best matching materials first, with presigned URLs.
+    """
+    if not storage_client or not search_index.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search index is not available yet."
+        )
+
+    hits, total = search_index.search(q, limit)
+
+    # Blobs deleted since the last index rebuild are dropped
+    entries = [entry for entry in (catalog.get_entry(name) for name, _ in hits) if entry is not None]
+
+    try:
+        signed_urls = await signer.sign_many(entry.name for entry in entries)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Timed out waiting for Cloud Storage"
+        )
+
+    materials = [
+        Material(
+            name=entry.name,
+            url=signed_urls[entry.name].url,
+            size=entry.size,
+            content_type=entry.content_type,
+            uploaded_at=entry.updated,
+            uploaded_by=current_user.id
+        )
+        for entry in entries
+    ]
+    return MaterialList(
+        materials=materials,
+        total=total,
+        page=1,
+        pages=1
+    )
+
+
+@router.get("/{name:path}/content")
+async def download_material(
+    name: str,
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Stream a PDF through the API instead of a presigned URL.
+    
+    Supports single HTTP Range requests. Popular files are served from a
+    local disk cache; memory use stays flat regardless of the file size.
+    Enabled with MATERIALS_PROXY_ENABLED=true.
+    """
+    if not MATERIALS_PROXY_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Material downloads are served through presigned URLs"
+        )
+    if not storage_client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="GCS client is not available. Cannot retrieve materials."
+        )
+
+    entry = catalog.get_entry(name)
+    if entry is None or entry.size is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Material not found"
+        )
+
+    etag = f'"{entry.generation}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": "private, max-age=3600"
+    }
+
+    # A Range is only honoured if the client's copy is still current
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, entry.size)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{entry.size}"}
+        )
+
+    start, end = byte_range if byte_range else (0, entry.size - 1)
+    status_code = status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{entry.size}"
+
+    # Opened before responding: a copy evicted meanwhile is streamed from GCS instead
+    try:
+        cached = await asyncio.to_thread(blob_cache.open, entry.name, entry.generation)
+    except OSError as e:
+        print(f"Download cache: could not open {entry.name}: {e}")
+        cached = None
+    if cached is not None:
+        return CachedFileResponse(cached, start, end, status_code, headers, "application/pdf")
+
+    fill = None
+    if blob_cache.cacheable(entry.size):
+        if byte_range:
+            # PDF viewers fetch in ranges; warm the cache for the next request
+            schedule_cache_fill(storage, blob_cache, entry.name, entry.generation, entry.size)
+        else:
+            fill = blob_cache.begin_fill(entry.name, entry.generation)
+
+    return StreamingResponse(
+        stream_from_storage(storage, blob_cache, entry.name, entry.generation, start, end, fill=fill),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/pdf"
+    )
@@ -1,8 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import get_db
-from models import User
+from models import Principal
 from schemas import UserProfile
 from utils import get_current_user
 
@@ -14,7 +12,7 @@ router = APIRouter(
 
 
 @router.get("", response_model=UserProfile)
-async def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(current_user: Principal = Depends(get_current_user)):
     """
     Get profile information for the currently authenticated user.
     """
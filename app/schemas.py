@@ -79,6 +79,7 @@ class MaterialList(BaseModel):
     total: int
     page: int
     pages: int
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page; null on the last page")
 
 class HTTPError(BaseModel):
     detail: str
@@ -108,3 +109,42 @@ class StandardResponse(BaseModel):
     success: bool
     message: str
     data: Optional[Dict[str, Any]] = None
+
+class UserImportResult(BaseModel):
+    """Outcome of one record of a bulk user import."""
+    line: int
+    email: Optional[str] = None
+    status: str = Field(..., description="created, updated, skipped (email already registered) or invalid")
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class UserImportResponse(BaseModel):
+    created: int
+    updated: int
+    skipped: int
+    invalid: int
+    results: List[UserImportResult]
+
+class UserDirectory(BaseModel):
+    """One page of the admin user directory."""
+    users: List[UserResponse]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page; null on the last page")
+
+class UserFilter(BaseModel):
+    """Selects users by the same criteria as the admin user directory."""
+    is_active: Optional[bool] = None
+    is_admin: Optional[bool] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    last_login_after: Optional[datetime] = None
+    last_login_before: Optional[datetime] = None
+
+class BulkUserTargets(BaseModel):
+    """Users a bulk operation applies to; all given criteria must match."""
+    ids: Optional[List[int]] = None
+    emails: Optional[List[EmailStr]] = None
+    filter: Optional[UserFilter] = None
+
+class BulkUserResult(BaseModel):
+    action: str
+    affected: int = Field(..., description="Users whose row was changed")
@@ -0,0 +1,420 @@
+import asyncio
+import hashlib
+import heapq
+import json
+import math
+import multiprocessing
+import os
+import re
+import time
+from array import array
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from mmap import ACCESS_READ, mmap
+from typing import Dict, List, Optional, Tuple
+
+from catalog import CatalogEntry
+from metrics import registry
+from storage import AsyncStorage
+
+# Search configuration
+# Off by default: every instance downloads the whole bucket to build it
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "false").lower() == "true"
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", "/tmp/materials-search")
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# PDFs downloaded or being extracted at once, on threads separate from the storage pool
+SEARCH_DOWNLOAD_CONCURRENCY = int(os.getenv("SEARCH_DOWNLOAD_CONCURRENCY", "2"))
+SEARCH_MAX_PDF_BYTES = int(os.getenv("SEARCH_MAX_PDF_BYTES", str(50 * 1024 * 1024)))
+SEARCH_DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("SEARCH_DOWNLOAD_TIMEOUT_SECONDS", "120"))
+# A worker still extracting one PDF after this long is killed
+SEARCH_EXTRACT_TIMEOUT_SECONDS = float(os.getenv("SEARCH_EXTRACT_TIMEOUT_SECONDS", "120"))
+# PDFs extracted between two rewrites of the posting lists
+SEARCH_BATCH_SIZE = int(os.getenv("SEARCH_BATCH_SIZE", "100"))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MAX_TOKEN_LENGTH = 40
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+# Metrics
+search_queries = registry.counter("search_queries_total", "Full-text search queries served")
+search_query_seconds = registry.histogram(
+    "search_query_seconds",
+    "Time spent evaluating a full-text query against the index",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+search_documents_indexed = registry.counter(
+    "search_documents_indexed_total",
+    "PDFs whose text was extracted into the index, by outcome"
+)
+search_rebuild_seconds = registry.histogram(
+    "search_rebuild_seconds",
+    "Time spent rewriting the posting lists",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case alphanumeric tokens, without stop words and single characters."""
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if 1 < len(token) <= MAX_TOKEN_LENGTH and token not in STOP_WORDS
+    ]
+
+
+# The functions below run in the search process pool
+
+def _lower_priority() -> None:
+    # Extraction must never compete with request handling for CPU
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+
+
+def terms_path(index_dir: str, name: str) -> str:
+    """Path of the file holding a document's term frequencies."""
+    digest = hashlib.sha1(name.encode()).hexdigest()
+    return os.path.join(index_dir, "terms", f"{digest}.json")
+
+
+def write_terms(path: str, terms: Dict[str, int]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(terms, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+
+def extract_terms(pdf_path: str, path: str) -> None:
+    """Extract the term frequencies of a PDF's text, page by page, into ``path``."""
+    from pypdf import PdfReader
+
+    counts: Counter = Counter()
+    with open(pdf_path, "rb") as f:
+        for page in PdfReader(f).pages:
+            counts.update(tokenize(page.extract_text() or ""))
+    write_terms(path, dict(counts))
+
+
+def build_postings(index_dir: str) -> None:
+    """
+    Rewrite the posting lists from the per-document term frequencies.
+
+    The documents are the ones listed in ``generations.json``, each with its
+    terms in a file under ``terms/``. Postings are stored per term as
+    contiguous native-endian uint32 ``(doc_id, tf)`` pairs ordered by doc id.
+    The lexicon maps each term to its offset and document frequency and names
+    the postings file, and is swapped in atomically after the postings file
+    is complete.
+    """
+    with open(os.path.join(index_dir, "generations.json")) as f:
+        names = sorted(json.load(f))
+
+    docs = []
+    inverted = defaultdict(lambda: array("I"))
+    for doc_id, name in enumerate(names):
+        try:
+            with open(terms_path(index_dir, name)) as f:
+                terms = json.load(f)
+        except FileNotFoundError:
+            terms = {}
+        docs.append([name, sum(terms.values())])
+        for term, tf in terms.items():
+            postings = inverted[term]
+            postings.append(doc_id)
+            postings.append(tf)
+
+    postings_name = f"postings-{time.time_ns()}.bin"
+    postings_path = os.path.join(index_dir, postings_name)
+    lexicon = {}
+    offset = 0
+    with open(postings_path + ".tmp", "wb") as f:
+        for term in sorted(inverted):
+            postings = inverted[term]
+            postings.tofile(f)
+            lexicon[term] = [offset, len(postings) // 2]
+            offset += len(postings)
+    os.replace(postings_path + ".tmp", postings_path)
+
+    lexicon_path = os.path.join(index_dir, "lexicon.json")
+    with open(lexicon_path + ".tmp", "w") as f:
+        json.dump({"postings": postings_name, "docs": docs, "terms": lexicon}, f, separators=(",", ":"))
+    os.replace(lexicon_path + ".tmp", lexicon_path)
+
+    # Readers keep their mapping of the old file after it is unlinked
+    for filename in os.listdir(index_dir):
+        if filename.startswith("postings-") and filename != postings_name:
+            os.unlink(os.path.join(index_dir, filename))
+
+
+class IndexReader:
+    """Read-only view of the on-disk index with memory-mapped posting lists."""
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "lexicon.json")) as f:
+            lexicon = json.load(f)
+        self.docs: List[List] = lexicon["docs"]
+        self.terms: Dict[str, List[int]] = lexicon["terms"]
+        self.avgdl = (sum(length for _, length in self.docs) / len(self.docs)) if self.docs else 0.0
+
+        with open(os.path.join(index_dir, lexicon["postings"]), "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self._postings = memoryview(mmap(f.fileno(), 0, access=ACCESS_READ)).cast("I")
+            else:
+                self._postings = memoryview(array("I"))
+
+    def search(self, query: str, limit: int) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Return the best matching documents containing every query term.
+
+        Returns:
+            Tuple of ([(name, score), ...] best first, total matching documents)
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.docs:
+            return [], 0
+
+        lists = []
+        for term in terms:
+            entry = self.terms.get(term)
+            if entry is None:
+                return [], 0
+            offset, df = entry
+            lists.append((df, self._postings[offset:offset + 2 * df]))
+
+        # Start from the rarest term so the candidate set only shrinks
+        lists.sort(key=lambda item: item[0])
+        scores: Dict[int, float] = {}
+        for position, (df, postings) in enumerate(lists):
+            idf = math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+            matched: Dict[int, float] = {}
+            for i in range(0, len(postings), 2):
+                doc_id = postings[i]
+                if position and doc_id not in scores:
+                    continue
+                tf = postings[i + 1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.docs[doc_id][1] / (self.avgdl or 1))
+                matched[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+            scores = matched
+            if not scores:
+                return [], 0
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self.docs[doc_id][0], score) for doc_id, score in best], len(scores)
+
+
+class SearchIndex:
+    """
+    Incrementally maintained full-text index over the PDFs in the bucket.
+
+    ``sync`` is registered as a catalog listener. Only blobs whose generation
+    changed are downloaded, a few at a time on the index's own threads so
+    listing and signing keep the storage pool, to a temporary file that a
+    low-priority worker process extracts page by page. Each document's term
+    frequencies are kept on disk; only the generations are held in memory.
+    The posting lists are rewritten and swapped in atomically after every
+    ``SEARCH_BATCH_SIZE`` PDFs, together with the generations indexed so far.
+    A worker stuck on one PDF is killed after ``SEARCH_EXTRACT_TIMEOUT_SECONDS``
+    and that PDF is skipped until it changes; PDFs caught by a worker crash
+    are retried at the next sync on a fresh pool.
+    """
+
+    def __init__(
+        self,
+        storage: AsyncStorage,
+        index_dir: str = SEARCH_INDEX_DIR,
+        workers: int = SEARCH_WORKERS,
+        download_concurrency: int = SEARCH_DOWNLOAD_CONCURRENCY
+    ):
+        self.storage = storage
+        self.index_dir = index_dir
+        self.workers = workers
+        self.download_concurrency = download_concurrency
+        self._generations: Optional[Dict[str, Optional[int]]] = None
+        self._reader: Optional[IndexReader] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._downloads: Optional[ThreadPoolExecutor] = None
+        self._in_flight = asyncio.Semaphore(download_concurrency)
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._reader is not None
+
+    async def start(self) -> None:
+        """Open the index left on disk by a previous run, if any."""
+        if os.path.exists(os.path.join(self.index_dir, "lexicon.json")):
+            self._reader = await asyncio.to_thread(IndexReader, self.index_dir)
+
+    def search(self, query: str, limit: int) -> Tuple[List[Tuple[str, float]], int]:
+        search_queries.inc()
+        with search_query_seconds.time():
+            return self._reader.search(query, limit)
+
+    async def sync(self, entries: Tuple[CatalogEntry, ...]) -> None:
+        """Re-extract changed PDFs and rewrite the index."""
+        async with self._lock:
+            if self._generations is None:
+                self._generations = await asyncio.to_thread(self._load_generations)
+
+            current = {entry.name for entry in entries}
+            removed = [name for name in self._generations if name not in current]
+            changed = [
+                entry for entry in entries
+                if entry.name not in self._generations
+                or self._generations[entry.name] != entry.generation
+            ]
+            if not changed and not removed and self._reader is not None:
+                return
+
+            for name in removed:
+                del self._generations[name]
+            await asyncio.to_thread(self._remove_terms, removed)
+
+            # Published and persisted batch by batch, so a cold index becomes
+            # useful early and a restart resumes where it stopped
+            for i in range(0, max(len(changed), 1), SEARCH_BATCH_SIZE):
+                batch = changed[i:i + SEARCH_BATCH_SIZE]
+                # The semaphore, not the number of coroutines, bounds the PDFs held at once
+                done = await asyncio.gather(*(self._extract(entry) for entry in batch))
+                for entry, indexed in zip(batch, done):
+                    if indexed:
+                        self._generations[entry.name] = entry.generation
+                await self._rebuild()
+
+    async def _extract(self, entry: CatalogEntry) -> bool:
+        """
+        Download and extract one PDF.
+
+        Returns:
+            bool: False if the PDF should be tried again at the next sync
+        """
+        path = terms_path(self.index_dir, entry.name)
+        if entry.size is not None and entry.size > SEARCH_MAX_PDF_BYTES:
+            search_documents_indexed.inc(labels={"outcome": "skipped"})
+            await asyncio.to_thread(write_terms, path, {})
+            return True
+        async with self._in_flight:
+            pdf_path = f"{path}.pdf"
+            loop = asyncio.get_running_loop()
+            try:
+                await asyncio.wait_for(
+                    loop.run_in_executor(self._get_downloads(), self._download, entry.name, entry.generation, pdf_path),
+                    timeout=SEARCH_DOWNLOAD_TIMEOUT_SECONDS
+                )
+                await self._run_in_pool(extract_terms, pdf_path, path, timeout=SEARCH_EXTRACT_TIMEOUT_SECONDS)
+            except BrokenProcessPool as e:
+                # A worker died, maybe while extracting another PDF; not this blob's fault
+                print(f"Search: worker pool failed while indexing {entry.name}, will retry: {e}")
+                search_documents_indexed.inc(labels={"outcome": "retry"})
+                return False
+            except Exception as e:
+                # Recorded as empty so the blob is retried only when it changes
+                print(f"Search: could not index {entry.name}: {e!r}")
+                search_documents_indexed.inc(labels={"outcome": "error"})
+                await asyncio.to_thread(write_terms, path, {})
+                return True
+            finally:
+                await asyncio.to_thread(self._unlink, pdf_path)
+        search_documents_indexed.inc(labels={"outcome": "ok"})
+        return True
+
+    def _download(self, name: str, generation: Optional[int], pdf_path: str) -> None:
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        blob = self.storage.bucket().blob(name, generation=generation)
+        blob.download_to_filename(pdf_path, timeout=SEARCH_DOWNLOAD_TIMEOUT_SECONDS)
+
+    async def _rebuild(self) -> None:
+        with search_rebuild_seconds.time():
+            await asyncio.to_thread(self._store_generations)
+            await self._run_in_pool(build_postings, self.index_dir)
+            self._reader = await asyncio.to_thread(IndexReader, self.index_dir)
+
+    def _load_generations(self) -> Dict[str, Optional[int]]:
+        try:
+            with open(os.path.join(self.index_dir, "generations.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _store_generations(self) -> None:
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = os.path.join(self.index_dir, "generations.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self._generations, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+    def _remove_terms(self, names: List[str]) -> None:
+        for name in names:
+            self._unlink(terms_path(self.index_dir, name))
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    async def _run_in_pool(self, fn, *args, timeout: Optional[float] = None):
+        """
+        Run ``fn`` in the worker pool, replacing the pool if it breaks.
+
+        Raises:
+            asyncio.TimeoutError: If ``fn`` did not finish in time; its worker is killed
+            BrokenProcessPool: If a worker died; the next call gets a new pool
+        """
+        executor = self._get_executor()
+        try:
+            return await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(executor, fn, *args),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            # A cancelled future does not stop its worker, only killing it does
+            self._reset_executor(executor, kill=True)
+            raise
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            raise
+
+    def _reset_executor(self, executor: ProcessPoolExecutor, kill: bool = False) -> None:
+        # Concurrent callers may see the same pool break; replace it once
+        if self._executor is not executor:
+            return
+        self._executor = None
+        if kill:
+            for process in list((executor._processes or {}).values()):
+                process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_downloads(self) -> ThreadPoolExecutor:
+        if self._downloads is None:
+            self._downloads = ThreadPoolExecutor(
+                max_workers=self.download_concurrency,
+                thread_name_prefix="search-gcs"
+            )
+        return self._downloads
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned (not forked) workers: the parent runs an event loop and threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._downloads is not None:
+            self._downloads.shutdown(wait=False, cancel_futures=True)
+            self._downloads = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
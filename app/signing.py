@@ -0,0 +1,151 @@
+import os
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from cache import TTLCache
+from metrics import registry
+from storage import AsyncStorage
+
+# Signing configuration
+SIGNED_URL_EXPIRATION_SECONDS = int(os.getenv("SIGNED_URL_EXPIRATION_SECONDS", "3600"))
+SIGNED_URL_REUSE_MARGIN_SECONDS = int(os.getenv("SIGNED_URL_REUSE_MARGIN_SECONDS", "600"))
+SIGNED_URL_CACHE_SIZE = int(os.getenv("SIGNED_URL_CACHE_SIZE", "50000"))
+
+# Metrics
+signed_urls = registry.counter(
+    "signed_urls_total",
+    "Signed URLs handed out by source (cache, signed, error)"
+)
+signing_batch_seconds = registry.histogram(
+    "url_signing_batch_seconds",
+    "Time spent signing the cache misses of one batch"
+)
+signing_throughput = registry.gauge(
+    "url_signing_last_batch_per_second",
+    "Signatures per second achieved by the last signing batch"
+)
+
+
+class SignedUrl(NamedTuple):
+    url: str
+    signed_at: float
+    expires_at: float
+
+
+class UrlSigner:
+    """
+    Batch V4 URL signer with reuse of still-valid signatures.
+
+    Signed URLs for the materials bucket are not user-specific, so a URL is
+    cached and handed to every caller until ``SIGNED_URL_REUSE_MARGIN_SECONDS``
+    before it expires. Cache misses of a batch are signed in one pass with a
+    single bucket handle and the client's credentials; with a service account
+    key the signature is computed locally without any network call. Signing
+    runs in the storage pool, so the event loop only does cache lookups.
+    """
+
+    def __init__(
+        self,
+        storage: AsyncStorage,
+        expiration: int = SIGNED_URL_EXPIRATION_SECONDS,
+        reuse_margin: int = SIGNED_URL_REUSE_MARGIN_SECONDS,
+        cache_size: int = SIGNED_URL_CACHE_SIZE
+    ):
+        if reuse_margin >= expiration:
+            raise ValueError("reuse_margin must be shorter than expiration")
+        self.storage = storage
+        self.expiration = expiration
+        self.reuse_margin = reuse_margin
+        self._cache = TTLCache(maxsize=cache_size)
+
+    def get_cached(self, name: str) -> Optional[SignedUrl]:
+        """Return the cached signature for a blob if it is still safe to hand out."""
+        return self._cache.get(name)
+
+    async def sign_many(self, names: Iterable[str]) -> Dict[str, SignedUrl]:
+        """
+        Return a signed URL for each blob name, signing only cache misses.
+
+        Args:
+            names: Blob names in the materials bucket
+
+        Returns:
+            Dict[str, SignedUrl]: Signed URL per blob name
+        """
+        result: Dict[str, SignedUrl] = {}
+        missing = []
+        for name in names:
+            cached = self._cache.get(name)
+            if cached is not None:
+                result[name] = cached
+            else:
+                missing.append(name)
+
+        if result:
+            signed_urls.inc(len(result), labels={"source": "cache"})
+        if missing:
+            result.update(await self.storage.run(self._sign_batch, missing))
+        return result
+
+    def _sign_batch(self, names: list) -> Dict[str, SignedUrl]:
+        bucket = self.storage.bucket()
+        signing_kwargs = self._signing_kwargs()
+        signed_at = time.time()
+        expires_at = signed_at + self.expiration
+
+        result: Dict[str, SignedUrl] = {}
+        start = time.perf_counter()
+        for name in names:
+            try:
+                url = bucket.blob(name).generate_signed_url(
+                    version="v4",
+                    expiration=timedelta(seconds=self.expiration),
+                    method="GET",
+                    **signing_kwargs
+                )
+            except Exception as e:
+                print(f"Error generating presigned URL: {e}")
+                signed_urls.inc(labels={"source": "error"})
+                # Fall back to a URL indicating signing failure; never cached
+                result[name] = SignedUrl(
+                    url=f"https://storage.googleapis.com/{self.storage.bucket_name}/{name}?error=signing_failed",
+                    signed_at=signed_at,
+                    expires_at=signed_at
+                )
+                continue
+
+            signed = SignedUrl(url=url, signed_at=signed_at, expires_at=expires_at)
+            # Stop handing the URL out a safety margin before it really expires
+            self._cache.set(name, signed, expires_at=expires_at - self.reuse_margin)
+            result[name] = signed
+            signed_urls.inc(labels={"source": "signed"})
+
+        elapsed = time.perf_counter() - start
+        signing_batch_seconds.observe(elapsed)
+        if elapsed > 0:
+            signing_throughput.set(len(names) / elapsed)
+        return result
+
+    def _signing_kwargs(self) -> Dict[str, str]:
+        """
+        Resolve how to sign once per batch.
+
+        Service account keys sign locally. Token-only credentials (e.g. the
+        Cloud Run metadata server) cannot, so they fall back to the IAM
+        signBlob API with the service account email and a current token.
+        """
+        credentials = getattr(self.storage.client, "_credentials", None)
+        if credentials is None:
+            return {}
+        if getattr(credentials, "signer", None) is not None:
+            # Private key held locally
+            return {"credentials": credentials}
+
+        if not credentials.valid:
+            from google.auth.transport.requests import Request
+            credentials.refresh(Request())
+        return {
+            "service_account_email": credentials.service_account_email,
+            "access_token": credentials.token
+        }
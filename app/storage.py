@@ -0,0 +1,119 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from metrics import registry
+
+# Storage I/O configuration
+GCS_MAX_CONCURRENCY = int(os.getenv("GCS_MAX_CONCURRENCY", "8"))
+GCS_TIMEOUT_SECONDS = float(os.getenv("GCS_TIMEOUT_SECONDS", "10"))
+
+# Metrics
+storage_calls_in_flight = registry.gauge(
+    "storage_calls_in_flight",
+    "GCS calls currently queued or running in the storage pool"
+)
+storage_call_seconds = registry.histogram(
+    "storage_call_seconds",
+    "Duration of GCS calls made through the storage pool, by operation"
+)
+storage_timeouts = registry.counter(
+    "storage_timeouts_total",
+    "GCS calls abandoned after GCS_TIMEOUT_SECONDS, by operation"
+)
+
+
+class AsyncStorage:
+    """
+    Async facade over the blocking ``google.cloud.storage`` client.
+
+    Every call runs in a dedicated, bounded thread pool so a slow bucket
+    operation can never stall the event loop, and is abandoned after
+    ``GCS_TIMEOUT_SECONDS``. The same timeout is passed down to the client
+    so the worker thread is released as well.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket_name: str,
+        max_concurrency: int = GCS_MAX_CONCURRENCY,
+        timeout: float = GCS_TIMEOUT_SECONDS
+    ):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="gcs"
+        )
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def bucket(self):
+        return self.client.bucket(self.bucket_name)
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run a blocking callable in the storage pool.
+
+        Args:
+            fn: Blocking function to call
+            timeout: Override for ``GCS_TIMEOUT_SECONDS``
+
+        Raises:
+            asyncio.TimeoutError: If the call does not finish in time
+        """
+        op = getattr(fn, "__name__", "call")
+        loop = asyncio.get_running_loop()
+        storage_calls_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs)),
+                timeout=timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            storage_timeouts.inc(labels={"op": op})
+            raise
+        finally:
+            storage_calls_in_flight.dec()
+            storage_call_seconds.observe(time.perf_counter() - start, labels={"op": op})
+
+    async def list_blobs(self, **kwargs) -> list:
+        """List the bucket, fully materializing the iterator inside the pool."""
+        def list_blobs():
+            return list(self.bucket().list_blobs(timeout=self.timeout, **kwargs))
+        return await self.run(list_blobs)
+
+    async def get_blob(self, name: str):
+        """Fetch blob metadata, or None if the blob does not exist."""
+        def get_blob():
+            return self.bucket().get_blob(name, timeout=self.timeout)
+        return await self.run(get_blob)
+
+    async def download_range(self, name: str, start: int, end: int, generation: Optional[int] = None) -> bytes:
+        """Download bytes ``start``..``end`` (inclusive) of a blob generation."""
+        def download_range():
+            blob = self.bucket().blob(name, generation=generation)
+            return blob.download_as_bytes(start=start, end=end, timeout=self.timeout)
+        return await self.run(download_range)
+
+    async def warm_up(self) -> None:
+        """Fetch an access token and open a connection to GCS ahead of the first request."""
+        def warm_up():
+            credentials = getattr(self.client, "_credentials", None)
+            if credentials is not None and not credentials.valid:
+                from google.auth.transport.requests import Request
+                credentials.refresh(Request())
+            # One small listing opens the TLS session the client keeps reusing
+            list(self.bucket().list_blobs(max_results=1, timeout=self.timeout))
+        await self.run(warm_up)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -9,7 +9,8 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.main import app
-from app.db import Base, get_db, async_session
+from app.db import get_db, async_session
+from app.models import Base
 
 # Test database URL
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
@@ -53,3 +54,80 @@ async def client(db_session):
     
     # Clean up overrides
     app.dependency_overrides = {}
+
+
+class FakePipeline:
+    """Pipeline of FakeRedis; ``pipelined`` only sends raw commands."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def execute_command(self, *args):
+        self.commands.append(args)
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        replies = []
+        for command, *args in self.commands:
+            command = command.upper()
+            if command == "GET":
+                replies.append(self.redis.data.get(args[0]))
+            elif command == "SET":
+                self.redis.data[args[0]] = args[1]
+                replies.append(True)
+            elif command == "DEL":
+                replies.append(sum(self.redis.data.pop(key, None) is not None for key in args))
+            elif command == "PUBLISH":
+                self.redis.published.append((args[0], args[1]))
+                replies.append(0)
+            else:
+                raise NotImplementedError(command)
+        self.commands = []
+        return replies
+
+
+class FakeRedis:
+    """In-memory stand-in for the parts of redis.asyncio.Redis the app uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+        self.lookups = 0
+        self.round_trips = 0
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def exists(self, key):
+        self.lookups += 1
+        return int(key in self.data)
+
+    async def scan_iter(self, match=None, count=None):
+        prefix = match.rstrip("*") if match else ""
+        for key in list(self.data):
+            if key.startswith(prefix):
+                yield key
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
@@ -0,0 +1,137 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, User
+from app.routers import admin, auth
+from app.schemas import BulkUserTargets
+
+CREATED = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def no_redis():
+    raise ConnectionError("Redis is not available in tests")
+
+
+def token_for(user_id, email, scopes):
+    return auth.create_access_token(
+        {"sub": str(user_id), "email": email, "scopes": scopes},
+        expires_delta=timedelta(minutes=5)
+    )
+
+
+@pytest.fixture
+def admin_client(monkeypatch):
+    """Client over an in-memory database with one admin and 25 learners."""
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[User.__table__])
+        async with session_factory() as session:
+            session.add(User(id=1, email="admin@example.com", hashed_password="x", is_admin=True, created_at=CREATED))
+            for i in range(2, 27):
+                session.add(User(
+                    id=i,
+                    email=f"learner{i}@example.com",
+                    hashed_password="x",
+                    is_active=i % 5 != 0,
+                    created_at=CREATED + timedelta(days=i)
+                ))
+            await session.commit()
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    asyncio.run(setup())
+    # Keep the auth caches of other tests out of the way
+    user_cache = admin.user_cache
+    user_cache.local.clear()
+    monkeypatch.setattr(user_cache, "_get_redis", no_redis)
+    monkeypatch.setattr(admin, "read_session_factory", lambda user_id=None: session_factory)
+
+    app = FastAPI()
+    api_router = APIRouter(prefix="/api")
+    api_router.include_router(admin.router)
+    app.include_router(api_router)
+    app.dependency_overrides[admin.get_db] = override_get_db
+
+    token = token_for(1, "admin@example.com", ["user", "admin"])
+    return TestClient(app, headers={"Authorization": f"Bearer {token}"})
+
+
+def test_directory_pages_through_users_by_id(admin_client):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 10, "is_active": "true"}
+        if cursor:
+            params["cursor"] = cursor
+        page = admin_client.get("/api/admin/users", params=params).json()
+        seen.extend(user["id"] for user in page["users"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [i for i in range(1, 27) if i % 5 != 0]
+
+
+def test_directory_requires_admin_scope(admin_client):
+    token = token_for(2, "learner2@example.com", ["user"])
+    response = admin_client.get("/api/admin/users", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+
+
+def test_export_streams_matching_users(admin_client):
+    params = {"format": "csv", "created_after": (CREATED + timedelta(days=20)).isoformat()}
+    response = admin_client.get("/api/admin/users", params=params)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == list(range(20, 27))
+
+    response = admin_client.get("/api/admin/users", params={"format": "ndjson", "is_admin": "true"})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["email"] for line in lines] == ["admin@example.com"]
+
+
+def test_bulk_action_updates_matching_users_in_one_statement(admin_client):
+    response = admin_client.post("/api/admin/users/bulk/deactivate", json={"filter": {"is_admin": True}})
+    # The acting admin is never deactivated
+    assert response.json() == {"action": "deactivate", "affected": 0}
+
+    before = (CREATED + timedelta(days=10)).isoformat()
+    response = admin_client.post("/api/admin/users/bulk/promote", json={"filter": {"created_before": before}})
+    assert response.json()["affected"] == 8
+
+    response = admin_client.post(
+        "/api/admin/users/bulk/deactivate",
+        json={"filter": {"is_admin": True, "is_active": True}}
+    )
+    # Learners 2..9 were promoted; 5 was already inactive
+    assert response.json()["affected"] == 7
+
+    assert admin_client.post("/api/admin/users/bulk/activate", json={}).status_code == 400
+
+
+def test_id_targets_bind_one_array_parameter():
+    clauses = admin.target_clauses(BulkUserTargets(ids=list(range(50000))))
+    statement = admin.bulk_update_statement(admin.BulkAction.DEACTIVATE, clauses, acting_user_id=1)
+    compiled = statement.compile(dialect=postgresql.dialect())
+    assert "= ANY (%(target_ids)s" in str(compiled)
+    assert "RETURNING users.id" in str(compiled)
+    assert len(compiled.params) < 5
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.catalog import MaterialsCatalog
+from app.storage import AsyncStorage
+
+
+class FakeBlob:
+    def __init__(self, name, size=100, generation=1):
+        self.name = name
+        self.size = size
+        self.updated = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.generation = generation
+        self.content_type = "application/pdf"
+
+
+class FakeBucket:
+    def __init__(self, client):
+        self.client = client
+
+    def list_blobs(self, **kwargs):
+        self.client.list_calls += 1
+        if self.client.fail:
+            raise RuntimeError("GCS unavailable")
+        return list(self.client.blobs)
+
+
+class FakeStorageClient:
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.list_calls = 0
+        self.fail = False
+
+    def bucket(self, name):
+        return FakeBucket(self)
+
+
+def make_catalog(client, redis_client, refresh_interval=60):
+    catalog = MaterialsCatalog(AsyncStorage(client, "test-bucket"), refresh_interval=refresh_interval)
+    catalog._redis = redis_client
+    return catalog
+
+
+@pytest.mark.asyncio
+async def test_catalog_lists_bucket_once_and_filters_pdfs(fake_redis):
+    client = FakeStorageClient([FakeBlob("b.pdf"), FakeBlob("a.PDF"), FakeBlob("notes.txt")])
+    catalog = make_catalog(client, fake_redis)
+
+    entries = await catalog.get_entries()
+    assert [entry.name for entry in entries] == ["a.PDF", "b.pdf"]
+
+    # Subsequent reads are served from memory
+    await catalog.get_entries()
+    await catalog.get_entries()
+    assert client.list_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_catalog_serves_stale_snapshot_when_gcs_fails(fake_redis):
+    client = FakeStorageClient([FakeBlob("a.pdf")])
+    catalog = make_catalog(client, fake_redis, refresh_interval=10)
+    await catalog.get_entries()
+
+    # Age the snapshot and break GCS
+    catalog._loaded_at = time.time() - 60
+    client.fail = True
+
+    entries = await catalog.get_entries()
+    assert [entry.name for entry in entries] == ["a.pdf"]
+
+    # Let the background revalidation run and fail quietly
+    await asyncio.sleep(0)
+    await catalog._revalidate_task
+    assert [entry.name for entry in await catalog.get_entries()] == ["a.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_new_instance_starts_warm_from_redis(fake_redis):
+    redis_client = fake_redis
+    client = FakeStorageClient([FakeBlob("a.pdf", generation=7)])
+    await make_catalog(client, redis_client).refresh()
+
+    other = make_catalog(FakeStorageClient([]), redis_client)
+    assert await other.load_from_redis()
+    entries = await other.get_entries()
+    assert entries[0].name == "a.pdf"
+    assert entries[0].generation == 7
+
+
+@pytest.mark.asyncio
+async def test_get_page_walks_catalog_by_name(fake_redis):
+    client = FakeStorageClient([FakeBlob(f"{i:02d}.pdf") for i in range(5)])
+    catalog = make_catalog(client, fake_redis)
+
+    entries, offset, total = await catalog.get_page(2)
+    assert [entry.name for entry in entries] == ["00.pdf", "01.pdf"]
+    assert (offset, total) == (0, 5)
+
+    entries, offset, total = await catalog.get_page(2, after="01.pdf")
+    assert [entry.name for entry in entries] == ["02.pdf", "03.pdf"]
+    assert offset == 2
+
+    # The cursor stays valid even if its blob disappeared in the meantime
+    entries, offset, _ = await catalog.get_page(2, after="03a.pdf")
+    assert [entry.name for entry in entries] == ["04.pdf"]
+    assert offset == 4
+
+
+@pytest.mark.asyncio
+async def test_listeners_only_see_changed_snapshots_and_the_latest_one(fake_redis):
+    client = FakeStorageClient([FakeBlob("a.pdf")])
+    catalog = make_catalog(client, fake_redis, refresh_interval=0)
+    seen = []
+    release = asyncio.Event()
+
+    async def listener(entries):
+        seen.append([(entry.name, entry.generation) for entry in entries])
+        await release.wait()
+
+    catalog.add_listener(listener)
+    await catalog.refresh()
+    await asyncio.sleep(0)
+    assert seen == [[("a.pdf", 1)]]
+
+    # While the listener is busy: an unchanged refresh, then two changes
+    await catalog.refresh()
+    client.blobs = [FakeBlob("a.pdf", generation=2)]
+    await catalog.refresh()
+    client.blobs = [FakeBlob("a.pdf", generation=2), FakeBlob("b.pdf")]
+    await catalog.refresh()
+
+    release.set()
+    for _ in range(5):
+        await asyncio.sleep(0)
+    # Only the latest snapshot was delivered after the first one
+    assert seen == [[("a.pdf", 1)], [("a.pdf", 2), ("b.pdf", 1)]]
+
+    # An unchanged bucket notifies nobody
+    await catalog.refresh()
+    await asyncio.sleep(0)
+    assert len(seen) == 2
+    await catalog.stop()
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import db
+from app.models import User
+
+
+def test_reads_use_primary_without_replica(monkeypatch):
+    monkeypatch.setattr(db, "replica_session", None)
+    db.mark_user_written(7)
+    assert db.read_session_factory(7) is db.async_session
+    assert db.read_session_factory() is db.async_session
+
+
+def test_recently_written_users_read_from_primary(monkeypatch):
+    replica = object()
+    clock = [1000.0]
+    monkeypatch.setattr(db, "replica_session", replica)
+    monkeypatch.setattr(db, "_recent_writes", {})
+    monkeypatch.setattr(db.time, "monotonic", lambda: clock[0])
+
+    assert db.read_session_factory(7) is replica
+    db.mark_user_written(7)
+    assert db.read_session_factory(7) is db.async_session
+    assert db.read_session_factory(8) is replica
+    assert db.read_session_factory() is replica
+
+    clock[0] += db.REPLICA_READ_YOUR_WRITES_SECONDS + 1
+    assert db.read_session_factory(7) is replica
+
+
+def test_pool_gauges_are_labelled_by_engine():
+    rendered = db.registry.render()
+    assert 'db_pool_size{engine="primary"}' in rendered
+    assert 'db_pool_checked_out{engine="primary"}' in rendered
+
+
+@pytest.mark.asyncio
+async def test_request_timing_counts_queries_and_pool_waits():
+    engine = create_async_engine("sqlite+aiosqlite://", **db.pool_options("timing-test"))
+    db.instrument_engine("timing-test", engine)
+    timing = db.start_request_timing()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        await conn.execute(text("SELECT 2"))
+    await engine.dispose()
+
+    assert timing.queries == 2
+    assert timing.query_seconds > 0 and timing.wait_seconds > 0
+    assert db.db_pool_wait_seconds.count({"engine": "timing-test"}) == 1
+    assert db.db_connection_age_seconds.count({"engine": "timing-test"}) == 1
+    assert timing.server_timing().startswith('db;dur=')
+
+
+@pytest.mark.asyncio
+async def test_release_connection_returns_it_before_the_session_ends():
+    engine = create_async_engine("sqlite+aiosqlite://", **db.pool_options("release-test"))
+    db.instrument_engine("release-test", engine)
+    db.start_request_timing({"route": SimpleNamespace(path="/api/things")})
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_factory() as session:
+        # Nothing is checked out until the first query
+        assert engine.pool.checkedout() == 0
+        await session.execute(text("SELECT 1"))
+        assert engine.pool.checkedout() == 1
+
+        await db.release_connection(session)
+        assert engine.pool.checkedout() == 0
+        assert db.db_connection_hold_seconds.count({"route": "/api/things"}) == 1
+
+        await session.execute(text("SELECT 1"))
+        assert engine.pool.checkedout() == 1
+
+        session.add(User(email="pending@example.com", hashed_password="x"))
+        with pytest.raises(RuntimeError):
+            await db.release_connection(session)
+        session.expunge_all()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_db_pool_leaves_open_connections_in_the_pool(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/warm.db", **db.pool_options("warm-test"))
+    assert await db.warm_db_pool(3, engine) == 3
+    assert engine.pool.checkedin() == 3
+    assert engine.pool.checkedout() == 0
+    # Never more than the pool keeps
+    assert await db.warm_db_pool(100, engine) == db.DB_POOL_SIZE
+    await engine.dispose()
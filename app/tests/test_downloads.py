@@ -0,0 +1,82 @@
+import pytest
+
+from app.blob_cache import BlobCache
+from app.downloads import parse_range
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    # Multipart ranges fall back to the whole blob
+    assert parse_range("bytes=0-1,5-6", 100) is None
+
+    for header in ("bytes=100-", "bytes=9-3", "bytes=abc", "bytes=-0"):
+        with pytest.raises(ValueError):
+            parse_range(header, 100)
+
+
+def fill(cache, name, generation, size):
+    tmp = cache.begin_fill(name, generation)
+    tmp.write(b"x" * size)
+    cache.commit_fill(name, generation, tmp)
+
+
+def cached(cache, name, generation):
+    """Whether the blob is cached; also marks it recently used."""
+    f = cache.open(name, generation)
+    if f is None:
+        return False
+    f.close()
+    return True
+
+
+def test_blob_cache_evicts_least_recently_used(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=250, max_file_bytes=200)
+    fill(cache, "a.pdf", 1, 100)
+    fill(cache, "b.pdf", 1, 100)
+    assert cached(cache, "a.pdf", 1)
+
+    # b.pdf is now the least recently used entry
+    fill(cache, "c.pdf", 1, 100)
+    assert not cached(cache, "b.pdf", 1)
+    assert cached(cache, "a.pdf", 1)
+    assert cached(cache, "c.pdf", 1)
+
+    # A new generation is a different file
+    assert not cached(cache, "a.pdf", 2)
+
+
+def test_blob_cache_fill_is_reserved_once(tmp_path):
+    cache = BlobCache(str(tmp_path))
+    first = cache.begin_fill("a.pdf", 1)
+    assert cache.begin_fill("a.pdf", 1) is None
+
+    cache.abort_fill("a.pdf", 1, first)
+    assert not cached(cache, "a.pdf", 1)
+    assert cache.begin_fill("a.pdf", 1) is not None
+
+
+def test_blob_cache_open_survives_eviction(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=150, max_file_bytes=200)
+    fill(cache, "a.pdf", 1, 100)
+    f = cache.open("a.pdf", 1)
+
+    # Evicts a.pdf while it is being read
+    fill(cache, "b.pdf", 1, 100)
+    assert cache.open("a.pdf", 1) is None
+    with f:
+        assert f.read() == b"x" * 100
+
+
+def test_blob_cache_open_misses_when_the_file_is_gone(tmp_path):
+    cache = BlobCache(str(tmp_path))
+    fill(cache, "a.pdf", 1, 100)
+    for path in tmp_path.iterdir():
+        path.unlink()
+
+    assert cache.open("a.pdf", 1) is None
+    # The entry is forgotten, so the next request can fill it again
+    assert cache.begin_fill("a.pdf", 1) is not None
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+
+from app.hashing import BCRYPT_ROUNDS, PasswordHasher
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_round_trip():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    try:
+        hashed = await hasher.hash("Secret123!")
+        assert await hasher.verify("Secret123!", hashed)
+        assert not await hasher.verify("wrong", hashed)
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_verify_and_update_rehashes_off_target_hashes():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    try:
+        on_target = await hasher.hash("Secret123!")
+        assert await hasher.verify_and_update("Secret123!", on_target) == (True, None)
+
+        cheap = bcrypt.using(rounds=4).hash("Secret123!")
+        valid, new_hash = await hasher.verify_and_update("Secret123!", cheap)
+        assert valid
+        assert bcrypt.from_string(new_hash).rounds == BCRYPT_ROUNDS
+        assert await hasher.verify_and_update("wrong", cheap) == (False, None)
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_rejects_with_retry_after():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    try:
+        results = await asyncio.gather(
+            hasher.hash("Secret123!"),
+            hasher.hash("Secret123!"),
+            return_exceptions=True
+        )
+        assert isinstance(results[0], str)
+        assert isinstance(results[1], HTTPException)
+        assert results[1].status_code == 503
+        assert "Retry-After" in results[1].headers
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_many_keeps_order():
+    hasher = PasswordHasher(workers=2, max_queue=0)
+    try:
+        passwords = [f"Secret{i}!" for i in range(40)]
+        hashes = await hasher.hash_many(passwords, rounds=4)
+        assert len(hashes) == 40
+        assert all(bcrypt.verify(p, h) for p, h in zip(passwords, hashes))
+        assert bcrypt.from_string(hashes[0]).rounds == 4
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_many_leaves_a_worker_for_logins(monkeypatch):
+    hasher = PasswordHasher(workers=3, max_queue=0)
+    running = []
+    peak = []
+
+    async def submit(op, fn, *args, admit=True):
+        running.append(op)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(op)
+        return fn(*args)
+
+    monkeypatch.setattr(hasher, "_submit", submit)
+    hashes = await hasher.hash_many([f"Secret{i}!" for i in range(6)], rounds=4)
+    assert len(hashes) == 6
+    assert max(peak) == 2
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.login_buffer import LastLoginBuffer, bulk_update_statement
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeSession:
+    def __init__(self, log, fail):
+        self.log = log
+        self.fail = fail
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, execution_options=None):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.log.append(statement)
+
+    async def commit(self):
+        pass
+
+
+def make_buffer(fail=False):
+    log = []
+    buffer = LastLoginBuffer(session_factory=lambda: FakeSession(log, fail), batch_size=2)
+    return buffer, log
+
+
+def test_bulk_update_is_a_single_update_from_values():
+    sql = str(bulk_update_statement([(1, NOW, None, None), (2, NOW, "hash", "old")]).compile(dialect=postgresql.dialect()))
+    assert sql.startswith("UPDATE users SET")
+    assert "FROM (VALUES" in sql
+    # The rehash only replaces the hash it was verified against
+    assert "WHEN (pending.hashed_password IS NOT NULL AND users.hashed_password = pending.old_hash)" in sql
+    assert "ELSE users.hashed_password END" in sql
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_latest_login_per_user_in_batches():
+    buffer, log = make_buffer()
+    buffer.record(1, NOW, "rehashed", "verified")
+    buffer.record(1, NOW + timedelta(seconds=1))
+    buffer.record(2, NOW)
+    buffer.record(3, NOW)
+
+    assert await buffer.flush() == 3
+    assert len(log) == 2
+    first = log[0].compile(dialect=postgresql.dialect()).params
+    # User 1 keeps the newest timestamp and the pending rehash
+    assert NOW + timedelta(seconds=1) in first.values()
+    assert "rehashed" in first.values()
+    assert "verified" in first.values()
+    assert await buffer.flush() == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_logins_for_retry():
+    buffer, log = make_buffer(fail=True)
+    buffer.record(1, NOW)
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+    buffer.record(1, NOW + timedelta(seconds=5))
+    assert buffer._pending == {1: (NOW + timedelta(seconds=5), None, None)}
+    assert log == []
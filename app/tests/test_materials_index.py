@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.catalog import CatalogEntry
+from app.materials_index import MaterialsIndex
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeSession:
+    """Holds the materials table as {name: (generation, uploaded_at)}."""
+
+    def __init__(self, table, log):
+        self.table = table
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def scalar(self, statement):
+        # pg_try_advisory_xact_lock
+        return True
+
+    async def execute(self, statement):
+        if statement.is_select:
+            return [(name, *row) for name, row in self.table.items()]
+        if statement.is_delete:
+            names = statement.whereclause.right.value
+            self.log.append(("delete", sorted(names)))
+            for name in names:
+                self.table.pop(name, None)
+        else:
+            rows = [
+                {getattr(column, "key", column): value for column, value in row.items()}
+                for row in statement._multi_values[0]
+            ]
+            self.log.append(("upsert", sorted(row["name"] for row in rows)))
+            for row in rows:
+                self.table[row["name"]] = (row["generation"], row["uploaded_at"])
+
+    async def commit(self):
+        pass
+
+
+def entry(name, generation=1):
+    return CatalogEntry(name, 10, NOW, generation)
+
+
+@pytest.mark.asyncio
+async def test_sync_diffs_against_the_table_each_time():
+    table, log = {}, []
+    index = MaterialsIndex(session_factory=lambda: FakeSession(table, log))
+
+    await index.sync((entry("a.pdf"), entry("b.pdf")))
+    assert log == [("upsert", ["a.pdf", "b.pdf"])]
+
+    # Unchanged bucket: no writes
+    log.clear()
+    await index.sync((entry("a.pdf"), entry("b.pdf")))
+    assert log == []
+
+    # An instance with an older snapshot removed b.pdf; the next sync restores it
+    del table["b.pdf"]
+    await index.sync((entry("a.pdf"), entry("b.pdf")))
+    assert log == [("upsert", ["b.pdf"])]
+
+    log.clear()
+    await index.sync((entry("a.pdf", generation=2),))
+    assert log == [("upsert", ["a.pdf"]), ("delete", ["b.pdf"])]
+    assert table == {"a.pdf": (2, NOW)}
+
+
+@pytest.mark.parametrize("position, sort", [
+    ({"after": 1}, "name"),
+    ({"offset": "x"}, "name"),
+    ({"offset": -1}, "name"),
+    ({"offset": True}, "name"),
+    ({"after": "a.pdf", "key": "10"}, "size"),
+    ({"after": "a.pdf", "key": 10}, "uploaded_at"),
+    ({"after": "a.pdf", "key": "yesterday"}, "uploaded_at"),
+])
+def test_tampered_cursors_are_rejected(position, sort):
+    from fastapi import HTTPException
+
+    from app.routers.materials import _cursor_position
+    from app.utils import encode_cursor
+
+    with pytest.raises(HTTPException) as exc:
+        _cursor_position(encode_cursor(position), sort, use_index=True)
+    assert exc.value.status_code == 400
+
+
+def test_cursor_position_round_trips():
+    from app.routers.materials import _cursor_position
+    from app.utils import encode_cursor
+
+    cursor = encode_cursor({"after": "a.pdf", "key": NOW.isoformat(), "offset": 50})
+    assert _cursor_position(cursor, "uploaded_at", use_index=True) == ("a.pdf", NOW, 50)
+    assert _cursor_position(None, "name", use_index=False) == (None, None, 0)
@@ -0,0 +1,95 @@
+import asyncio
+import sys
+from datetime import timedelta
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, User
+from app.routers import auth, users
+
+TEST_EMAIL = "reader@example.com"
+
+# The cache instance the routers' get_current_user uses
+user_cache = sys.modules[auth.get_current_user.__module__].user_cache
+
+
+async def create_user(session_factory) -> int:
+    async with session_factory() as session:
+        user = User(email=TEST_EMAIL, hashed_password="x", is_active=True, is_admin=False)
+        session.add(user)
+        await session.commit()
+        return user.id
+
+
+@pytest.fixture
+def counted_client(monkeypatch, fake_redis):
+    """Client over an in-memory database that records every SQL statement."""
+    monkeypatch.setattr(user_cache, "_get_redis", lambda: fake_redis)
+    user_cache.local.clear()
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[User.__table__])
+        return await create_user(session_factory)
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    user_id = asyncio.run(setup())
+
+    app = FastAPI()
+    api_router = APIRouter(prefix="/api")
+    api_router.include_router(auth.router)
+    api_router.include_router(users.router)
+    app.include_router(api_router)
+    app.dependency_overrides[auth.get_db] = override_get_db
+
+    token = auth.create_access_token(
+        {"sub": str(user_id), "email": TEST_EMAIL, "scopes": ["user"]},
+        expires_delta=timedelta(minutes=5)
+    )
+    client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+    statements.clear()
+    return client, statements
+
+
+@pytest.mark.parametrize("path", ["/api/auth/me", "/api/profile"])
+def test_authenticated_request_queries_user_once(counted_client, path):
+    client, statements = counted_client
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.json()["email"] == TEST_EMAIL
+    assert len([s for s in statements if "FROM users" in s]) == 1
+
+
+def test_steady_state_requests_skip_the_database(counted_client):
+    client, statements = counted_client
+    assert client.get("/api/auth/me").status_code == 200
+    statements.clear()
+
+    # Served from the in-process tier
+    assert client.get("/api/auth/me").status_code == 200
+    assert statements == []
+
+    # Served from Redis after the local tier expired
+    user_cache.local.clear()
+    assert client.get("/api/profile").status_code == 200
+    assert statements == []
@@ -0,0 +1,52 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app import rate_limit
+from app.rate_limit import Limit, RateLimiter, client_ip
+
+
+def make_request(forwarded=None, peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+def test_client_ip_uses_the_last_trusted_hop(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUSTED_PROXIES", 1)
+    assert client_ip(make_request("6.6.6.6, 1.2.3.4")) == "1.2.3.4"
+    assert client_ip(make_request()) == "10.0.0.1"
+
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUSTED_PROXIES", 0)
+    assert client_ip(make_request("6.6.6.6, 1.2.3.4")) == "10.0.0.1"
+
+
+def limiter_with_result(result):
+    limiter = RateLimiter(enabled=True)
+    calls = []
+
+    async def script(keys, args):
+        calls.append((keys, args))
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    limiter._script = script
+    return limiter, calls
+
+
+@pytest.mark.asyncio
+async def test_empty_bucket_rejects_with_retry_after():
+    limiter, calls = limiter_with_result([0, "2.4", 2])
+    with pytest.raises(HTTPException) as exc:
+        await limiter.hit("login", [("ip", "1.2.3.4", Limit(20, 10)), ("account", "abc", Limit(5, 6))])
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "3"
+    assert calls[0][0] == ["ratelimit:login:ip:1.2.3.4", "ratelimit:login:account:abc"]
+    assert calls[0][1] == [20, 10 / 60, 5, 0.1]
+    assert rate_limit.rate_limit_rejections.value({"route": "login", "scope": "account"}) >= 1
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_lets_requests_through():
+    limiter, _ = limiter_with_result(ConnectionError("down"))
+    await limiter.hit("signup", [("ip", "1.2.3.4", Limit(5, 2))])
@@ -0,0 +1,29 @@
+import time
+
+import pytest
+import redis.asyncio as redis
+from redis.exceptions import ConnectionError
+
+from app.db import InstrumentedRedisPool, pipelined
+
+
+@pytest.mark.asyncio
+async def test_pipelined_sends_one_round_trip_per_batch(fake_redis):
+    fake_redis.data = {f"key:{i}": f"value:{i}" for i in range(5)}
+    replies = await pipelined([("GET", f"key:{i}") for i in range(5)], client=fake_redis, batch_size=2)
+    assert replies == [f"value:{i}" for i in range(5)]
+    assert fake_redis.round_trips == 3
+
+
+@pytest.mark.asyncio
+async def test_unreachable_redis_fails_fast_and_frees_the_slot():
+    # Nothing listens on port 1
+    pool = InstrumentedRedisPool.from_url("redis://127.0.0.1:1/0", max_connections=1, timeout=5)
+    client = redis.Redis(connection_pool=pool)
+    for _ in range(2):
+        started = time.perf_counter()
+        with pytest.raises(ConnectionError):
+            await client.get("key")
+        assert time.perf_counter() - started < 1
+    assert not pool._in_use_connections
+    await pool.disconnect()
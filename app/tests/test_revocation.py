@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from app.revocation import BloomFilter, TokenRevocations
+
+
+def make_revocations(redis):
+    revocations = TokenRevocations(capacity=1000, error_rate=0.001)
+    revocations._get_redis = lambda: redis
+    return revocations
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.asyncio
+async def test_only_filter_hits_reach_redis(fake_redis):
+    redis = fake_redis
+    revocations = make_revocations(redis)
+    await revocations.revoke("revoked-jti", time.time() + 60)
+    assert redis.published == [("token:revoked", "revoked-jti")]
+
+    assert not await revocations.is_revoked("live-jti")
+    assert redis.lookups == 0
+    assert await revocations.is_revoked("revoked-jti")
+    assert redis.lookups == 1
+
+
+@pytest.mark.asyncio
+async def test_rebuild_seeds_filter_from_redis(fake_redis):
+    redis = fake_redis
+    await make_revocations(redis).revoke("revoked-jti", time.time() + 60)
+
+    other_instance = make_revocations(redis)
+    assert not await other_instance.is_revoked("revoked-jti")
+    await other_instance.rebuild()
+    assert await other_instance.is_revoked("revoked-jti")
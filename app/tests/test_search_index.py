@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.catalog import CatalogEntry
+from app.search_index import IndexReader, build_postings, terms_path, tokenize, write_terms
+
+
+def write_forward(index_dir, forward):
+    with open(index_dir / "generations.json", "w") as f:
+        json.dump({name: generation for name, (generation, _) in forward.items()}, f)
+    for name, (_, terms) in forward.items():
+        write_terms(terms_path(str(index_dir), name), terms)
+
+
+def test_tokenize_drops_stop_words_and_single_characters():
+    assert tokenize("The Quick, brown fox & a 2nd x-ray") == ["quick", "brown", "fox", "2nd", "ray"]
+
+
+def test_search_requires_every_term_and_ranks_by_frequency(tmp_path):
+    write_forward(tmp_path, {
+        "algebra.pdf": [1, {"linear": 3, "algebra": 10, "matrix": 4}],
+        "calculus.pdf": [1, {"limits": 8, "derivative": 5, "linear": 1}],
+        "notes.pdf": [1, {"algebra": 1, "linear": 1, "history": 20}],
+    })
+    build_postings(str(tmp_path))
+    reader = IndexReader(str(tmp_path))
+
+    hits, total = reader.search("Linear algebra", limit=10)
+    assert total == 2
+    assert [name for name, _ in hits] == ["algebra.pdf", "notes.pdf"]
+
+    assert reader.search("algebra derivative", limit=10) == ([], 0)
+    assert reader.search("unknownterm", limit=10) == ([], 0)
+
+
+def test_rebuild_swaps_in_new_postings(tmp_path):
+    write_forward(tmp_path, {"a.pdf": [1, {"first": 1}]})
+    build_postings(str(tmp_path))
+    old_reader = IndexReader(str(tmp_path))
+
+    write_forward(tmp_path, {"a.pdf": [2, {"second": 1}]})
+    build_postings(str(tmp_path))
+    new_reader = IndexReader(str(tmp_path))
+
+    assert [name for name, _ in new_reader.search("second", 5)[0]] == ["a.pdf"]
+    assert new_reader.search("first", 5) == ([], 0)
+    # The old mapping stays readable after its file is replaced
+    assert [name for name, _ in old_reader.search("first", 5)[0]] == ["a.pdf"]
+    assert len(list(tmp_path.glob("postings-*.bin"))) == 1
+
+
+def fake_indexer(tmp_path, monkeypatch, fail=()):
+    """SearchIndex with fake downloads and extraction; returns (index, peak downloads, rebuilds)."""
+    from app import search_index
+
+    active = []
+    peak = []
+    rebuilds = []
+
+    def download(self, name, generation, pdf_path):
+        active.append(name)
+        peak.append(len(active))
+        time.sleep(0.01)
+        active.remove(name)
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        with open(pdf_path, "w") as f:
+            f.write(name)
+
+    def extract(pdf_path, path):
+        with open(pdf_path) as f:
+            name = f.read()
+        if name in fail:
+            raise BrokenProcessPool("worker died")
+        write_terms(path, {name.split(".")[0]: 1})
+
+    def rebuild(index_dir):
+        with open(os.path.join(index_dir, "generations.json")) as f:
+            rebuilds.append(len(json.load(f)))
+        build_postings(index_dir)
+
+    index = search_index.SearchIndex(storage=None, index_dir=str(tmp_path), download_concurrency=2)
+    monkeypatch.setattr(search_index.SearchIndex, "_download", download)
+    monkeypatch.setattr(search_index, "extract_terms", extract)
+    monkeypatch.setattr(search_index, "build_postings", rebuild)
+    monkeypatch.setattr(search_index, "SEARCH_BATCH_SIZE", 4)
+    monkeypatch.setattr(index, "_get_executor", lambda: index._get_downloads())
+    return index, peak, rebuilds
+
+
+@pytest.mark.asyncio
+async def test_sync_bounds_downloads_and_publishes_batch_by_batch(tmp_path, monkeypatch):
+    index, peak, rebuilds = fake_indexer(tmp_path, monkeypatch)
+
+    entries = tuple(CatalogEntry(f"doc{i}.pdf", 10, None, 1) for i in range(10))
+    await index.sync(entries)
+    index.shutdown()
+
+    assert max(peak) <= 2
+    # Generations are persisted with every rewrite, so a restart resumes
+    assert rebuilds == [4, 8, 10]
+    assert index.ready and len(index._reader.docs) == 10
+    # The downloaded PDFs are not kept once extracted
+    assert not list(tmp_path.glob("terms/*.pdf"))
+
+
+@pytest.mark.asyncio
+async def test_pdfs_caught_by_a_worker_crash_are_retried(tmp_path, monkeypatch):
+    index, _, rebuilds = fake_indexer(tmp_path, monkeypatch, fail={"doc1.pdf"})
+    entries = tuple(CatalogEntry(f"doc{i}.pdf", 10, None, 1) for i in range(3))
+    await index.sync(entries)
+    assert "doc1.pdf" not in index._generations
+
+    index, _, rebuilds = fake_indexer(tmp_path, monkeypatch)
+    await index.sync(entries)
+    index.shutdown()
+    assert index._generations == {"doc0.pdf": 1, "doc1.pdf": 1, "doc2.pdf": 1}
+    assert index.search("doc1", 5)[1] == 1
+
+
+@pytest.mark.asyncio
+async def test_stuck_worker_is_killed_and_the_pool_replaced(tmp_path):
+    from app.search_index import SearchIndex
+
+    index = SearchIndex(storage=None, index_dir=str(tmp_path), workers=1)
+    executor = index._get_executor()
+    stuck = asyncio.create_task(index._run_in_pool(time.sleep, 60, timeout=5))
+    await asyncio.sleep(1)
+    processes = list(executor._processes.values())
+    with pytest.raises(asyncio.TimeoutError):
+        await stuck
+    assert processes
+    for process in processes:
+        process.join(5)
+        assert not process.is_alive()
+
+    assert index._get_executor() is not executor
+    assert await index._run_in_pool(abs, -3, timeout=30) == 3
+    index.shutdown()
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from app.signing import UrlSigner
+from app.storage import AsyncStorage
+
+
+class FakeBlob:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def generate_signed_url(self, **kwargs):
+        self.client.signatures += 1
+        return f"https://signed.example/{self.name}?sig={self.client.signatures}"
+
+
+class FakeBucket:
+    def __init__(self, client):
+        self.client = client
+
+    def blob(self, name):
+        return FakeBlob(self.client, name)
+
+
+class FakeStorageClient:
+    _credentials = None
+
+    def __init__(self):
+        self.signatures = 0
+
+    def bucket(self, name):
+        return FakeBucket(self)
+
+
+def make_signer(client):
+    return UrlSigner(AsyncStorage(client, "test-bucket"), expiration=3600, reuse_margin=600)
+
+
+@pytest.mark.asyncio
+async def test_sign_many_reuses_cached_signatures():
+    client = FakeStorageClient()
+    signer = make_signer(client)
+
+    first = await signer.sign_many(["a.pdf", "b.pdf"])
+    assert client.signatures == 2
+
+    # A warm listing performs no signing at all
+    second = await signer.sign_many(["a.pdf", "b.pdf"])
+    assert client.signatures == 2
+    assert second["a.pdf"].url == first["a.pdf"].url
+
+    # Only the new blob is signed
+    await signer.sign_many(["a.pdf", "b.pdf", "c.pdf"])
+    assert client.signatures == 3
+
+
+@pytest.mark.asyncio
+async def test_signature_is_not_reused_inside_safety_margin():
+    client = FakeStorageClient()
+    signer = make_signer(client)
+    await signer.sign_many(["a.pdf"])
+
+    # Pretend the URL was signed 55 minutes ago: inside the 10 minute margin
+    cached = signer.get_cached("a.pdf")
+    signer._cache.set("a.pdf", cached, expires_at=time.time() - 1)
+
+    await signer.sign_many(["a.pdf"])
+    assert client.signatures == 2
@@ -0,0 +1,41 @@
+import hashlib
+import time
+from datetime import timedelta
+
+import pytest
+from jose import JWTError
+
+from app import utils
+
+
+def test_decode_token_caches_verified_claims(monkeypatch):
+    token = utils.create_access_token({"sub": "1", "email": "a@example.com"}, timedelta(minutes=5))
+    first = utils.decode_token(token)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("token verified twice")
+
+    monkeypatch.setattr(utils.jwt, "decode", fail)
+    assert utils.decode_token(token) == first
+
+
+def test_decode_token_does_not_cache_failures():
+    token = utils.create_access_token({"sub": "1", "email": "a@example.com"}, timedelta(minutes=5))
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    for _ in range(2):
+        with pytest.raises(JWTError):
+            utils.decode_token(tampered)
+
+    expired = utils.create_access_token({"sub": "1", "email": "a@example.com"}, timedelta(seconds=-1))
+    with pytest.raises(JWTError):
+        utils.decode_token(expired)
+
+
+def test_tokens_without_exp_are_cached_for_a_bounded_time(monkeypatch):
+    token = utils.jwt.encode({"sub": "1"}, utils.SECRET_KEY, algorithm=utils.ALGORITHM)
+    now = time.time()
+    utils.decode_token(token)
+    key = hashlib.sha256(token.encode()).digest()
+    _, expires_at = utils._claims_cache._data[key]
+    assert expires_at is not None
+    assert expires_at <= now + utils.ACCESS_TOKEN_EXPIRE_MINUTES * 60 + 1
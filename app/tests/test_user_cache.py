@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+import redis.asyncio as redis
+
+from app.db import InstrumentedRedisPool
+from app.models import Principal
+from app.user_cache import USER_INVALIDATION_CHANNEL, UserCache
+
+
+def principal(is_active=True):
+    return Principal(id=1, email="user@example.com", is_active=is_active, is_admin=False)
+
+
+@pytest.mark.asyncio
+async def test_stale_reader_cannot_refill_redis_after_invalidation(fake_redis):
+    cache = UserCache()
+    cache._redis = fake_redis
+
+    # A request loads the row, then the user is deactivated and invalidated
+    stale = principal(is_active=True)
+    await cache.invalidate(1)
+    assert fake_redis.published == [(USER_INVALIDATION_CHANNEL, "1")]
+
+    # The request finishes and tries to cache what it read
+    await cache.set(stale)
+    cache.local.clear()
+    assert await cache.get(1) is None
+
+
+@pytest.mark.asyncio
+async def test_redis_copy_is_shared_once_no_tombstone_is_left(fake_redis):
+    cache = UserCache()
+    cache._redis = fake_redis
+    await cache.set(principal())
+    cache.local.clear()
+
+    assert (await cache.get(1)).to_dict() == principal().to_dict()
+
+
+class PubSubServer:
+    """Just enough of a Redis server to subscribe, then stay quiet until told to publish."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                await reader.readline()
+                args.append((await reader.readline()).strip().decode())
+            if args[0].upper() == "SUBSCRIBE":
+                writer.write(f"*3\r\n$9\r\nsubscribe\r\n${len(args[1])}\r\n{args[1]}\r\n:1\r\n".encode())
+                self.subscribers.append((args[1], writer))
+            else:
+                writer.write(b"+OK\r\n")
+            await writer.drain()
+
+    def publish(self, channel, data):
+        for subscribed, writer in self.subscribers:
+            if subscribed == channel:
+                writer.write(
+                    f"*3\r\n$7\r\nmessage\r\n${len(channel)}\r\n{channel}\r\n${len(data)}\r\n{data}\r\n".encode()
+                )
+
+    async def stop(self):
+        self.server.close()
+        for _, writer in self.subscribers:
+            writer.close()
+
+
+@pytest.mark.asyncio
+async def test_listener_survives_an_idle_channel():
+    server = PubSubServer()
+    port = await server.start()
+    pool = InstrumentedRedisPool.from_url(
+        f"redis://127.0.0.1:{port}/0", socket_timeout=0.2, decode_responses=True
+    )
+    cache = UserCache()
+    cache._redis = redis.Redis(connection_pool=pool)
+    cache.local.set(1, principal().to_dict())
+    cache.local.set(2, principal().to_dict())
+    await cache.start()
+    try:
+        # Quiet for several socket timeouts
+        await asyncio.sleep(1.0)
+        assert server.subscribers
+        server.publish(USER_INVALIDATION_CHANNEL, "1")
+        for _ in range(30):
+            if cache.local.get(1) is None:
+                break
+            await asyncio.sleep(0.1)
+        assert cache.local.get(1) is None
+        # The listener never dropped out, so the local tier was not cleared
+        assert cache.local.get(2) is not None
+    finally:
+        await cache.stop()
+        await pool.disconnect()
+        await server.stop()
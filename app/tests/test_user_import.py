@@ -0,0 +1,67 @@
+import pytest
+
+from app import user_import
+from app.user_import import import_users, iter_records, parse_row
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_iter_records_reassembles_lines_across_chunks():
+    records = [r async for r in iter_records(stream(b"email,pass", b"word\r\na@example.com,Secret1!\n\nb@ex", b"ample.com,x"), "csv")]
+    assert records == [
+        (2, {"email": "a@example.com", "password": "Secret1!"}),
+        (4, {"email": "b@example.com", "password": "x"}),
+    ]
+
+    records = [r async for r in iter_records(stream(b'{"email": "a@example.com"}\nnot json\n'), "ndjson")]
+    assert records[0] == (1, {"email": "a@example.com"})
+    assert records[1][0] == 2 and records[1][1].startswith("invalid JSON")
+
+
+def test_parse_row_validates_records():
+    row = parse_row(2, {"email": " a@example.com ", "password": "Secret123!", "is_admin": "yes"})
+    assert (row.email, row.is_active, row.is_admin) == ("a@example.com", True, True)
+
+    for record, error in [
+        ({"email": "nope", "password": "Secret123!"}, "invalid email"),
+        ({"email": "a@example.com"}, "exactly one"),
+        ({"email": "a@example.com", "password": "weak"}, "strength"),
+        ({"email": "a@example.com", "hashed_password": "plain"}, "bcrypt"),
+        ({"email": "a@example.com", "password": "Secret123!", "is_active": "maybe"}, "boolean"),
+    ]:
+        with pytest.raises(ValueError, match=error):
+            parse_row(2, record)
+
+
+@pytest.mark.asyncio
+async def test_import_users_reports_every_line(monkeypatch):
+    async def hash_many(passwords, rounds):
+        return [f"hashed:{p}" for p in passwords]
+
+    staged = []
+
+    async def copy_and_merge(db, rows, update_existing):
+        staged.extend(rows)
+        return [{"line": 2, "id": 10, "status": "created"}]
+
+    monkeypatch.setattr(user_import.password_hasher, "hash_many", hash_many)
+    monkeypatch.setattr(user_import, "_copy_and_merge", copy_and_merge)
+
+    body = (
+        b"email,password\n"
+        b"new@example.com,Secret123!\n"
+        b"old@example.com,Secret123!\n"
+        b"new@example.com,Secret123!\n"
+        b"bad,Secret123!\n"
+    )
+    results = await import_users(None, stream(body), "csv")
+    assert [(r["line"], r["status"]) for r in results] == [
+        (2, "created"), (3, "skipped"), (4, "invalid"), (5, "invalid")
+    ]
+    assert results[0]["id"] == 10
+    assert results[2]["error"] == "duplicate email in file"
+    assert [row.hashed_password for row in staged] == ["hashed:Secret123!"] * 2
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app import warmup
+from app.warmup import Readiness
+
+
+@pytest.mark.asyncio
+async def test_ready_after_all_steps_finish_even_if_optional_ones_fail():
+    readiness = Readiness()
+    assert not readiness.ready
+
+    async def ok():
+        return "done"
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def broken():
+        raise ConnectionError("refused")
+
+    steps = await readiness.warm_up({"database": ok, "storage": slow, "redis": broken}, timeout=0.05)
+
+    assert readiness.ready
+    assert steps == {"database": "ok", "storage": "timeout", "redis": "error: refused"}
+
+
+@pytest.mark.asyncio
+async def test_not_ready_until_the_database_step_succeeds(monkeypatch):
+    monkeypatch.setattr(warmup, "WARMUP_RETRY_SECONDS", 0.01)
+    readiness = Readiness()
+    attempts = []
+
+    async def database():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("refused")
+
+    steps = await readiness.warm_up({"database": database}, timeout=1)
+    assert steps == {"database": "error: refused"}
+    assert readiness.finished and not readiness.ready
+
+    for _ in range(100):
+        if readiness.ready:
+            break
+        await asyncio.sleep(0.01)
+    assert readiness.ready
+    assert readiness.steps == {"database": "ok"}
+    assert len(attempts) == 3
+
+    await readiness.stop()
+    assert not readiness.ready
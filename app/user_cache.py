@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import redis.asyncio as redis
+
+from cache import TTLCache
+from db import REPLICA_READ_YOUR_WRITES_SECONDS, get_redis_client, mark_user_written, pipelined
+from metrics import registry
+from models import Principal
+
+# User cache configuration
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "5"))
+USER_CACHE_REDIS_TTL_SECONDS = int(os.getenv("USER_CACHE_REDIS_TTL_SECONDS", "300"))
+# How long an invalidated user cannot be cached in Redis again; covers
+# requests that loaded the row before the change and replica lag
+USER_CACHE_TOMBSTONE_SECONDS = int(os.getenv(
+    "USER_CACHE_TOMBSTONE_SECONDS", str(max(30, int(REPLICA_READ_YOUR_WRITES_SECONDS)))
+))
+USER_INVALIDATION_CHANNEL = "user:invalidate"
+# Redis value left by invalidate in place of the principal
+TOMBSTONE = "-"
+
+# Metrics
+user_cache_lookups = registry.counter(
+    "user_cache_lookups_total",
+    "Authenticated user lookups by tier that answered (local, redis, miss)"
+)
+user_cache_invalidations = registry.counter(
+    "user_cache_invalidations_total",
+    "User cache entries dropped, by origin (local, remote)"
+)
+
+
+def _to_principal(data: Dict[str, Any]) -> Principal:
+    """Rebuild a principal from its cached fields."""
+    created_at = data.get("created_at")
+    last_login = data.get("last_login")
+    return Principal(
+        id=data["id"],
+        email=data["email"],
+        is_active=data["is_active"],
+        is_admin=data["is_admin"],
+        created_at=datetime.fromisoformat(created_at) if created_at else None,
+        last_login=datetime.fromisoformat(last_login) if last_login else None
+    )
+
+
+class UserCache:
+    """
+    Two-tier cache of the principals needed to authenticate a request.
+
+    The first tier is a small in-process LRU with a TTL of a few seconds, the
+    second a JSON copy in Redis shared by all instances. Writers call
+    ``invalidate`` after committing a change; it replaces the Redis copy with
+    a short-lived tombstone and publishes the user id so every instance
+    evicts its local entry, which makes deactivations effective immediately
+    (and keeps that user's reads on the primary until read replicas caught
+    up). ``set`` only writes to Redis if the key is absent, so a request that
+    loaded the row before the change cannot put the stale principal back
+    while the tombstone lasts. The local TTL bounds the damage of a missed
+    message or of such a request refilling its own local tier. Only the principal's columns are cached, never
+    the password hash.
+
+    Redis is an optimisation only: when it is unavailable lookups fall back
+    to the database and the local tier keeps working.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = USER_CACHE_SIZE,
+        ttl: float = USER_CACHE_TTL_SECONDS,
+        redis_ttl: int = USER_CACHE_REDIS_TTL_SECONDS
+    ):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.redis_ttl = redis_ttl
+        # Client override for tests; the shared pool client otherwise
+        self._redis: Optional[redis.Redis] = None
+        self._listener_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def redis_key(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    async def get(self, user_id: int) -> Optional[Principal]:
+        """Return the cached principal, or None if neither tier has it."""
+        data = self.local.get(user_id)
+        if data is not None:
+            user_cache_lookups.inc(labels={"tier": "local"})
+            return _to_principal(data)
+
+        try:
+            raw = await self._get_redis().get(self.redis_key(user_id))
+        except Exception as e:
+            print(f"User cache: could not read from Redis: {e}")
+            raw = None
+        if raw and raw != TOMBSTONE:
+            data = json.loads(raw)
+            self.local.set(user_id, data)
+            user_cache_lookups.inc(labels={"tier": "redis"})
+            return _to_principal(data)
+
+        user_cache_lookups.inc(labels={"tier": "miss"})
+        return None
+
+    async def set(self, principal: Principal) -> None:
+        """Cache a principal loaded from the database in both tiers."""
+        data = principal.to_dict()
+        self.local.set(principal.id, data)
+        try:
+            # Never over a tombstone: the row may have been read before the change
+            await self._get_redis().set(
+                self.redis_key(principal.id), json.dumps(data), ex=self.redis_ttl, nx=True
+            )
+        except Exception as e:
+            print(f"User cache: could not write to Redis: {e}")
+
+    async def invalidate(self, *user_ids: int) -> None:
+        """Drop users everywhere; call after committing a change to their rows."""
+        if not user_ids:
+            return
+        for user_id in user_ids:
+            self.local.delete(user_id)
+        mark_user_written(*user_ids)
+        user_cache_invalidations.inc(len(user_ids), labels={"origin": "local"})
+        commands = [
+            ("SET", self.redis_key(user_id), TOMBSTONE, "EX", USER_CACHE_TOMBSTONE_SECONDS)
+            for user_id in user_ids
+        ]
+        commands.extend(("PUBLISH", USER_INVALIDATION_CHANNEL, str(user_id)) for user_id in user_ids)
+        try:
+            await pipelined(commands, client=self._get_redis())
+        except Exception as e:
+            print(f"User cache: could not publish invalidation for {len(user_ids)} user(s): {e}")
+
+    async def start(self) -> None:
+        """Start listening for invalidations from other instances."""
+        if self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop the invalidation listener."""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener_task = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._get_redis().pubsub() as pubsub:
+                    await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+                    # Poll with an explicit timeout: a blocking read falls back to the
+                    # pool's socket timeout and would fail on a quiet channel
+                    while True:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message is not None and message["type"] == "message":
+                            user_id = int(message["data"])
+                            self.local.delete(user_id)
+                            mark_user_written(user_id)
+                            user_cache_invalidations.inc(labels={"origin": "remote"})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"User cache: invalidation listener failed, retrying: {e}")
+            # Messages may have been missed while disconnected
+            self.local.clear()
+            await asyncio.sleep(5)
+
+    def _get_redis(self) -> redis.Redis:
+        return self._redis if self._redis is not None else get_redis_client()
+
+
+# Process-wide cache used by get_current_user
+user_cache = UserCache()
@@ -0,0 +1,249 @@
+import csv
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import EmailStr, TypeAdapter, ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from hashing import BCRYPT_ROUNDS, password_hasher, pwd_context
+from metrics import registry
+from utils import validate_password_strength
+
+# Bulk import configuration
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "100000"))
+# Cost of hashes created by imports; lower values are upgraded at first login
+BCRYPT_IMPORT_ROUNDS = int(os.getenv("BCRYPT_IMPORT_ROUNDS", str(BCRYPT_ROUNDS)))
+IMPORT_COPY_BATCH = 5000
+
+STAGING_COLUMNS = ["line", "email", "hashed_password", "is_active", "is_admin"]
+
+# Metrics
+imported_rows = registry.counter(
+    "user_import_rows_total",
+    "Rows processed by bulk user imports, by status"
+)
+import_seconds = registry.histogram(
+    "user_import_seconds",
+    "Duration of bulk user imports"
+)
+
+_email_adapter = TypeAdapter(EmailStr)
+_TRUE = {"1", "true", "yes", "y"}
+_FALSE = {"0", "false", "no", "n", ""}
+
+
+@dataclass
+class ImportRow:
+    line: int
+    email: str
+    password: Optional[str]
+    hashed_password: Optional[str]
+    is_active: bool
+    is_admin: bool
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed request body into decoded lines without buffering it."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8-sig")
+    if buffer:
+        yield buffer.rstrip(b"\r").decode("utf-8-sig")
+
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield (line number, record) for a CSV (with header) or NDJSON body.
+
+    CSV records must fit on one line. Records that cannot be parsed are
+    yielded as the parse error message.
+    """
+    header = None
+    line_number = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        if fmt == "ndjson":
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, f"invalid JSON: {e}"
+        else:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip().lower() for name in values]
+                continue
+            yield line_number, dict(zip(header, values))
+
+
+def _parse_bool(value: Any, default: bool) -> bool:
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in _TRUE:
+        return True
+    if normalized in _FALSE:
+        return default if normalized == "" else False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def parse_row(line: int, record: Any) -> ImportRow:
+    """
+    Validate one import record.
+
+    Raises:
+        ValueError: With a message for the per-row report
+    """
+    if isinstance(record, str):
+        raise ValueError(record)
+    if not isinstance(record, dict):
+        raise ValueError("record must be an object")
+
+    try:
+        email = _email_adapter.validate_python((record.get("email") or "").strip())
+    except ValidationError:
+        raise ValueError("invalid email")
+
+    password = record.get("password") or None
+    hashed_password = record.get("hashed_password") or None
+    if bool(password) == bool(hashed_password):
+        raise ValueError("exactly one of password and hashed_password is required")
+    if password and not validate_password_strength(password):
+        raise ValueError("password does not meet the strength requirements")
+    if hashed_password and pwd_context.identify(hashed_password) != "bcrypt":
+        raise ValueError("hashed_password must be a bcrypt hash")
+
+    return ImportRow(
+        line=line,
+        email=email,
+        password=password,
+        hashed_password=hashed_password,
+        is_active=_parse_bool(record.get("is_active"), True),
+        is_admin=_parse_bool(record.get("is_admin"), False)
+    )
+
+
+async def import_users(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    update_existing: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Import users from a streamed CSV or NDJSON body.
+
+    Rows are validated as they arrive, passwords are hashed in parallel in
+    the hashing pool, and the rows are loaded with ``COPY`` into a temporary
+    staging table that is merged into ``users`` with one
+    ``INSERT ... ON CONFLICT (email)`` statement. Everything happens in the
+    caller's transaction; the caller commits.
+
+    Args:
+        db: Database session (asyncpg)
+        chunks: Request body stream
+        fmt: "csv" or "ndjson"
+        update_existing: Overwrite password and flags of existing users
+            instead of skipping them
+
+    Returns:
+        One result per record, ordered by line: line, email, status
+        (created, updated, skipped or invalid), id and error
+
+    Raises:
+        HTTPException: 413 if the file has more than IMPORT_MAX_ROWS records
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    rows: List[ImportRow] = []
+    seen = set()
+
+    with import_seconds.time():
+        async for line, record in iter_records(chunks, fmt):
+            if len(results) >= IMPORT_MAX_ROWS:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Imports are limited to {IMPORT_MAX_ROWS} rows"
+                )
+            email = record.get("email") if isinstance(record, dict) else None
+            try:
+                row = parse_row(line, record)
+                if row.email in seen:
+                    raise ValueError("duplicate email in file")
+            except ValueError as e:
+                results[line] = {"line": line, "email": email, "status": "invalid", "error": str(e)}
+                continue
+            seen.add(row.email)
+            rows.append(row)
+            results[line] = {"line": line, "email": row.email, "status": "skipped"}
+
+        # Hash plain-text passwords across all hashing workers
+        to_hash = [row for row in rows if row.password]
+        hashes = await password_hasher.hash_many([row.password for row in to_hash], rounds=BCRYPT_IMPORT_ROUNDS)
+        for row, hashed in zip(to_hash, hashes):
+            row.hashed_password = hashed
+            row.password = None
+
+        if rows:
+            for result in await _copy_and_merge(db, rows, update_existing):
+                results[result["line"]].update(result)
+
+    ordered = [results[line] for line in sorted(results)]
+    for result in ordered:
+        imported_rows.inc(labels={"status": result["status"]})
+    return ordered
+
+
+async def _copy_and_merge(db: AsyncSession, rows: List[ImportRow], update_existing: bool) -> List[Dict[str, Any]]:
+    await db.execute(text(
+        "CREATE TEMP TABLE users_import ("
+        " line integer NOT NULL,"
+        " email varchar NOT NULL,"
+        " hashed_password varchar NOT NULL,"
+        " is_active boolean NOT NULL,"
+        " is_admin boolean NOT NULL"
+        ") ON COMMIT DROP"
+    ))
+
+    # COPY straight through the session's asyncpg connection
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    for start in range(0, len(rows), IMPORT_COPY_BATCH):
+        await raw.driver_connection.copy_records_to_table(
+            "users_import",
+            columns=STAGING_COLUMNS,
+            records=[
+                (row.line, row.email, row.hashed_password, row.is_active, row.is_admin)
+                for row in rows[start:start + IMPORT_COPY_BATCH]
+            ]
+        )
+
+    if update_existing:
+        conflict = (
+            "DO UPDATE SET hashed_password = EXCLUDED.hashed_password,"
+            " is_active = EXCLUDED.is_active, is_admin = EXCLUDED.is_admin"
+        )
+    else:
+        conflict = "DO NOTHING"
+    # xmax is 0 only for rows this statement inserted
+    merged = await db.execute(text(
+        "WITH merged AS ("
+        " INSERT INTO users (email, hashed_password, is_active, is_admin, created_at)"
+        " SELECT email, hashed_password, is_active, is_admin, now() FROM users_import ORDER BY line"
+        f" ON CONFLICT (email) {conflict}"
+        " RETURNING id, email, (xmax = 0) AS inserted"
+        ")"
+        " SELECT s.line, m.id, m.inserted FROM merged m JOIN users_import s ON s.email = m.email"
+    ))
+    return [
+        {"line": line, "id": user_id, "status": "created" if inserted else "updated"}
+        for line, user_id, inserted in merged.all()
+    ]
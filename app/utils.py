@@ -1,23 +1,31 @@
 import os
+import base64
+import hashlib
+import json
 import secrets
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, Union, List, Tuple
+from typing import Optional, Dict, Any, AsyncIterator, Union, List, Tuple
 
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm, SecurityScopes
 from fastapi.security.utils import get_authorization_scheme_param
 from pydantic import ValidationError
+from sqlalchemy import bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from starlette.status import HTTP_403_FORBIDDEN
 
-from db import get_db
+from cache import TTLCache
+from db import async_session, db_reads, get_db, read_session_factory, release_connection
+from hashing import pwd_context
 
 # Import models and schemas
-from models import User
+from models import Principal, User
+from revocation import token_revocations
 from schemas import TokenData, UserRole
+from user_cache import user_cache
 
 # Security configuration
 SECRET_KEY = os.getenv("JWT_SECRET", secrets.token_urlsafe(32))
@@ -25,9 +33,11 @@ print(f"UTILS.PY: JWT_SECRET from env: '{SECRET_KEY}'")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # 30 minutes
 REFRESH_TOKEN_EXPIRE_DAYS = 7  # 7 days
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Verified token claims, keyed by token digest and expiring with the token
+# (tokens without ``exp`` last as long as an access token would)
+_claims_cache = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(
@@ -41,6 +51,21 @@ SCOPES = {
     UserRole.ADMIN: ["read:all_profiles", "manage:users", "read:materials", "write:materials"]
 }
 
+# Authentication lookup: a Core select of the principal's columns only, built
+# once so SQLAlchemy reuses its compiled form (and asyncpg its prepared statement)
+_users = User.__table__
+PRINCIPAL_QUERY = (
+    select(
+        _users.c.id,
+        _users.c.email,
+        _users.c.is_active,
+        _users.c.is_admin,
+        _users.c.created_at,
+        _users.c.last_login
+    )
+    .where(_users.c.id == bindparam("user_id"))
+)
+
 # Password verification and hashing
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
@@ -58,7 +83,7 @@ def create_access_token(
     """Create a new JWT access token."""
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire, "type": "access"})
+    to_encode.update({"exp": expire, "type": "access", "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def create_refresh_token(
@@ -68,25 +93,102 @@ def create_refresh_token(
     """Create a new JWT refresh token."""
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a JWT and return its claims, reusing earlier verifications.
+    
+    Verified claims are cached under a digest of the token until the token's
+    own ``exp`` (or for ``ACCESS_TOKEN_EXPIRE_MINUTES`` if it has none), so
+    repeat requests with the same token skip the signature check and JSON
+    parsing. Failed verifications are never cached.
+    
+    Args:
+        token: JWT token without the 'Bearer ' prefix
+        
+    Returns:
+        Dict: The decoded token payload (shared, do not modify)
+        
+    Raises:
+        JWTError: If the token is invalid or expired
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _claims_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(
+            token, 
+            SECRET_KEY, 
+            algorithms=[ALGORITHM],
+            options={"verify_aud": False}
+        )
+        _claims_cache.set(key, payload, expires_at=payload.get("exp"))
+    return payload
+
+def _token_user_id(token: Optional[str]) -> Optional[int]:
+    """User id of a valid access token, or None; never raises."""
+    if not token:
+        return None
+    if token.startswith("Bearer "):
+        token = token.split(" ")[1]
+    try:
+        return int(decode_token(token)["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
+async def get_read_db(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> AsyncIterator[AsyncSession]:
+    """
+    Database session for read-only dependencies.
+    
+    Routed to the read replica when one is configured, except for callers
+    whose user was modified in the last REPLICA_READ_YOUR_WRITES_SECONDS;
+    those (and everything when there is no replica) get the request's
+    primary session. Never write through this session.
+    
+    Args:
+        token: JWT token from the request, used to find the caller's user id
+        db: The request's primary session
+        
+    Yields:
+        AsyncSession: A replica or primary session
+    """
+    factory = read_session_factory(_token_user_id(token))
+    if factory is async_session:
+        db_reads.inc(labels={"engine": "primary"})
+        yield db
+        return
+    db_reads.inc(labels={"engine": "replica"})
+    async with factory() as session:
+        yield session
+
 # Authentication and authorization
 async def get_current_user(
     security_scopes: SecurityScopes,
+    request: Request,
     token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_read_db)
+) -> Principal:
     """
     Get the current user from the JWT token.
     
+    The user is looked up at most once per request and kept on
+    ``request.state``, so router-level dependencies, scoped variants and
+    endpoint parameters all share the same principal. Lookups go through
+    the shared user cache first and only reach the database on a miss,
+    with a Core query on the columns a principal holds.
+    
     Args:
         security_scopes: Security scopes required for the endpoint
+        request: The incoming request
         token: JWT token from the request
-        db: Database session
+        db: Read-only database session (replica when configured)
         
     Returns:
-        User: The authenticated user
+        Principal: The authenticated user
         
     Raises:
         HTTPException: If the token is invalid or user not found
@@ -111,12 +213,7 @@ async def get_current_user(
             token = token.split(" ")[1]
             
         # Decode JWT token
-        payload = jwt.decode(
-            token, 
-            SECRET_KEY, 
-            algorithms=[ALGORITHM],
-            options={"verify_aud": False}
-        )
+        payload = decode_token(token)
         
         # Extract user ID and email from token
         user_id = payload.get("sub")
@@ -126,15 +223,30 @@ async def get_current_user(
         if not user_id or not email or token_type != "access":
             raise credentials_exception
             
-        token_data = TokenData(email=email, user_id=user_id)
-    except (JWTError, ValidationError):
+        token_data = TokenData(email=email, user_id=int(user_id))
+    except (JWTError, ValidationError, ValueError):
+        raise credentials_exception
+    
+    # Reject tokens revoked at logout (answered in memory unless the filter matches)
+    jti = payload.get("jti")
+    if jti and await token_revocations.is_revoked(jti):
         raise credentials_exception
     
-    # Get user from database
-    result = await db.execute(select(User).where(User.email == token_data.email))
-    user = result.scalars().first()
+    # Get user from the cache or the database, once per request
+    user = getattr(request.state, "current_user", None)
+    if user is None:
+        user = await user_cache.get(token_data.user_id)
+        if user is None:
+            row = (await db.execute(PRINCIPAL_QUERY, {"user_id": token_data.user_id})).first()
+            # Don't hold the connection while the endpoint runs
+            await release_connection(db)
+            if row is not None:
+                user = Principal(*row)
+                await user_cache.set(user)
+        request.state.current_user = user
     
-    if user is None or not user.is_active:
+    # Tokens are only valid for the email they were issued to
+    if user is None or user.email != token_data.email or not user.is_active:
         raise credentials_exception
     
     # Check scopes if required
@@ -152,18 +264,16 @@ async def get_current_user(
 
 # Role-based access control
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-) -> User:
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     """
     Check if the current user is active.
     
     Args:
         current_user: The current authenticated user
-        db: Database session
         
     Returns:
-        User: The active user
+        Principal: The active user
         
     Raises:
         HTTPException: If the user is inactive
@@ -173,22 +283,11 @@ async def get_current_active_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Inactive user"
         )
-    
-    # Refresh user data from database
-    result = await db.execute(select(User).where(User.id == current_user.id))
-    user = result.scalars().first()
-    
-    if not user or not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found or inactive"
-        )
-        
-    return user
+    return current_user
 
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_active_user),
-) -> User:
+    current_user: Principal = Depends(get_current_active_user),
+) -> Principal:
     """
     Check if the current user is an admin.
     
@@ -196,7 +295,7 @@ async def get_current_admin_user(
         current_user: The current authenticated user
         
     Returns:
-        User: The admin user
+        Principal: The admin user
         
     Raises:
         HTTPException: If the user is not an admin
@@ -227,13 +326,7 @@ def verify_token(token: str) -> Dict[str, Any]:
         if token.startswith("Bearer "):
             token = token.split(" ")[1]
             
-        payload = jwt.decode(
-            token, 
-            SECRET_KEY, 
-            algorithms=[ALGORITHM],
-            options={"verify_aud": False}
-        )
-        return payload
+        return decode_token(token)
     except JWTError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -268,34 +361,37 @@ def validate_password_strength(password: str) -> bool:
         return False
     return True
 
-def generate_presigned_url(gcs_client, bucket_name: str, blob_name: str, expiration: int = 3600) -> str:
+# Opaque pagination cursors
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Encode a keyset position as an opaque, URL-safe cursor."""
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
     """
-    Generate a presigned URL for accessing a file in GCS using a provided client.
+    Decode a cursor produced by encode_cursor.
     
-    Args:
-        gcs_client: Initialized google.cloud.storage.Client instance
-        bucket_name: Name of the GCS bucket
-        blob_name: Name of the blob (file) in the bucket
-        expiration: Expiration time in seconds (default: 1 hour)
-        
-    Returns:
-        str: Presigned URL for accessing the file
+    Raises:
+        HTTPException: If the cursor is malformed
     """
-    # timedelta is imported at the top of utils.py
     try:
-        # Get the bucket and blob using the provided client
-        bucket = gcs_client.bucket(bucket_name)
-        blob = bucket.blob(blob_name)
-        
-        # Generate the signed URL
-        url = blob.generate_signed_url(
-            version="v4",
-            expiration=timedelta(seconds=expiration),
-            method="GET"
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(position, dict):
+            raise ValueError("cursor must encode an object")
+        return position
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
-        return url
-        
-    except Exception as e:
-        print(f"Error generating presigned URL: {e}")
-        # Fall back to a URL indicating signing failure
-        return f"https://storage.googleapis.com/{bucket_name}/{blob_name}?error=signing_failed"
+
+# Conditional requests
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against a strong ETag (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from db import DB_POOL_SIZE, REDIS_MAX_CONNECTIONS
+from metrics import registry
+
+# Warmup configuration
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", str(DB_POOL_SIZE)))
+WARMUP_REDIS_CONNECTIONS = int(os.getenv("WARMUP_REDIS_CONNECTIONS", str(min(4, REDIS_MAX_CONNECTIONS))))
+# Startup gives up on steps still running after this long and serves anyway
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30"))
+# Pause between retries of required steps that failed
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+# Metrics
+warmup_seconds = registry.histogram(
+    "warmup_step_seconds",
+    "Duration of startup warmup steps, by step and outcome"
+)
+
+
+class Readiness:
+    """
+    Whether this instance should receive traffic.
+
+    Becomes ready once ``warm_up`` has run and every required step (the
+    database by default) succeeded; other steps only degrade the instance and
+    are reported by ``/ready``. Required steps that failed are retried in the
+    background until they succeed. Not ready again once ``stop`` is called
+    at shutdown.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.finished = False
+        self.steps: Dict[str, str] = {}
+        self._retry_task: Optional[asyncio.Task] = None
+        registry.gauge("instance_ready", "1 once startup warmup finished, 0 before and while shutting down", lambda: int(self.ready))
+
+    async def warm_up(
+        self,
+        steps: Dict[str, Callable[[], Awaitable[object]]],
+        timeout: float = WARMUP_TIMEOUT_SECONDS,
+        required: Iterable[str] = ("database",)
+    ) -> Dict[str, str]:
+        """
+        Run warmup steps concurrently, then mark the instance ready.
+
+        A failing or slow optional step is logged and reported but does not
+        stop startup; requests then pay for whatever was not warmed. A failed
+        required step keeps the instance out of rotation until a background
+        retry succeeds.
+
+        Args:
+            steps: Step name to a coroutine function doing the work
+            timeout: Seconds each step may take
+            required: Steps without which the instance must not serve
+
+        Returns:
+            Dict: Outcome per step ("ok", "timeout" or "error: ...")
+        """
+        await asyncio.gather(*(self._run(name, step, timeout) for name, step in steps.items()))
+        self.finished = True
+        failed = {name: steps[name] for name in required if self.steps.get(name) != "ok"}
+        self.ready = not failed
+        if failed:
+            print(f"Warmup: not ready, retrying {', '.join(failed)} every {WARMUP_RETRY_SECONDS:.0f}s")
+            self._retry_task = asyncio.create_task(self._retry(failed, timeout))
+        return dict(self.steps)
+
+    async def stop(self) -> None:
+        """Fail readiness checks from now on, e.g. while shutting down."""
+        self.ready = False
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+            try:
+                await self._retry_task
+            except asyncio.CancelledError:
+                pass
+            self._retry_task = None
+
+    async def _retry(self, steps: Dict[str, Callable[[], Awaitable[object]]], timeout: float) -> None:
+        while steps:
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+            await asyncio.gather(*(self._run(name, step, timeout) for name, step in steps.items()))
+            steps = {name: step for name, step in steps.items() if self.steps[name] != "ok"}
+        self.ready = True
+        print("Warmup: required steps recovered, ready")
+
+    async def _run(self, name: str, step: Callable[[], Awaitable[object]], timeout: float) -> None:
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(step(), timeout=timeout)
+            outcome = "ok"
+            print(f"Warmup: {name} ready in {time.perf_counter() - started:.2f}s ({result})")
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            print(f"Warmup: {name} still not ready after {timeout:.0f}s, continuing")
+        except Exception as e:
+            outcome = f"error: {e}"
+            print(f"Warmup: {name} failed, continuing: {e}")
+        warmup_seconds.observe(
+            time.perf_counter() - started,
+            labels={"step": name, "outcome": outcome.split(":")[0]}
+        )
+        self.steps[name] = outcome
+
+
+# Process-wide readiness reported by /ready
+readiness = Readiness()
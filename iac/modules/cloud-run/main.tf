@@ -16,6 +16,16 @@ resource "google_cloud_run_service" "api" {
             memory = "512Mi"
           }
         }
+
+        # Route traffic only after the startup warmup finished
+        startup_probe {
+          http_get {
+            path = "/ready"
+          }
+          period_seconds    = 2
+          timeout_seconds   = 1
+          failure_threshold = 30
+        }
         
         # Environment variables from secrets
         env {